@@ -6,14 +6,25 @@ cd "$PROJECT_DIR"
 # 1. Run Wakeup Protocol
 "./lyra_env/bin/python3" scripts/wakeup.py
 
-# 2. Generate Session Context and Drop into Interactive Shell
-CONTEXT=$("./lyra_env/bin/python3" personality/scripts/personality_engine.py session_start)
+# 2. Keep the personality engine resident so hooks skip interpreter startup.
+# Hooks call personality/scripts/personality_hook.sh, which needs socat (or
+# OpenBSD nc) to skip Python entirely; without either it still works through
+# personality_client.py, at the cost of one interpreter start per hook.
+export PERSONALITY_PYTHON="$PROJECT_DIR/lyra_env/bin/python3"
+# A crashed daemon leaves its socket file behind, so ask it rather than test for the file.
+if ! personality/scripts/personality_hook.sh ping > /dev/null 2>&1; then
+    rm -f personality/.engine.sock
+    nohup "./lyra_env/bin/python3" personality/scripts/personality_daemon.py > /dev/null 2>&1 &
+fi
 
-# 3. Formulate Prompt
+# 3. Generate Session Context and Drop into Interactive Shell
+CONTEXT=$(personality/scripts/personality_hook.sh session_start)
+
+# 4. Formulate Prompt
 PROMPT="SYSTEM WAKEUP PROTOCOL COMPLETE. 
 $CONTEXT
 
 Warm Greeting Required: Please acknowledge Mayank, summarize our current state, and provide a warm greeting to start the session."
 
-# 4. Start Gemini
+# 5. Start Gemini
 gemini -i "$PROMPT"
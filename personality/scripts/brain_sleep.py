@@ -1,101 +1,153 @@
+import argparse
+import heapq
 import os
 import json
 import datetime
 import glob
 import shutil
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+import evolution_store
+import scorers
 
 # Constants
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 RAW_LOGS_DIR = os.path.join(BASE_DIR, 'raw_logs')
-PERMANENT_EVOLUTION = os.path.join(BASE_DIR, 'evolution.txt')
+CONSOLIDATED_STORE = os.path.join(BASE_DIR, 'consolidated_history')
 MEMORY_NETWORK_FILE = os.path.join(BASE_DIR, 'memory_network.json')
 CONSOLIDATED_LOG = os.path.join(BASE_DIR, 'logs', 'consolidation_history.jsonl')
 
-def load_json(path):
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except:
-        return {}
+PERMANENT_THRESHOLD = 0.5
+
+def scan_session(path, scorer=None):
+    """Streams one session file and returns its exchanges in timestamp order (runs in a worker).
+
+    If a worker-side scorer is given, only exchanges it rates as permanent are returned.
+    """
+    exchanges = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(entry, dict):
+                continue
+            exchanges.append({
+                "source": path,
+                "timestamp": entry.get('timestamp'),
+                "user": entry.get('user') or '',
+                "ai": entry.get('ai') or '',
+            })
+    if scorer is not None:
+        exchanges = select_permanent(exchanges, scorer.score(exchanges))
+    exchanges.sort(key=lambda e: e['timestamp'] or '')
+    return exchanges
+
+def select_permanent(exchanges, scores):
+    return [dict(e, score=s) for e, s in zip(exchanges, scores) if s >= PERMANENT_THRESHOLD]
+
+def to_insight(exchange):
+    return {
+        "source": exchange['source'],
+        "timestamp": exchange['timestamp'],
+        "score": exchange['score'],
+        "content": f"User: {exchange['user'][:100]}... | AI: {exchange['ai'][:100]}..."
+    }
 
-def save_json(path, data):
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
+def commit_insights(insights, now):
+    """Commits a batch of insights to the consolidated history (Permanent Memory)."""
+    evolution_store.commit(CONSOLIDATED_STORE, insights, now.isoformat())
+
+def purge(session_files):
+    # Only delete folders if they are empty
+    for sf in session_files:
+        os.remove(sf)
+        parent_dir = os.path.dirname(sf)
+        if parent_dir != RAW_LOGS_DIR and not os.listdir(parent_dir):
+            os.rmdir(parent_dir)
 
-def consolidate_memories():
+def consolidate_memories(threshold_days=30, workers=None, scorer=None):
     """
     Simulates the human 'sleep' phase.
-    1. Scans raw logs older than 30 days.
-    2. Analyzes them for key evolution points.
-    3. Commits to permanent memory.
-    4. Deletes the raw logs.
+    1. Scans raw logs older than threshold_days.
+    2. Analyzes them for key evolution points: sessions are parsed (and scored by
+       the keyword heuristic) in worker processes; an LLM scorer batches the
+       parsed exchanges from the main process.
+    3. Commits to permanent memory, one chunk of sessions at a time.
+    4. Deletes the raw logs of each chunk once it is committed.
+    Memory use is bounded by the chunk size, not by the size of the backlog.
     """
     print(f"[{datetime.datetime.now().isoformat()}] ENTERING BRAIN SLEEP PHASE...")
     
     now = datetime.datetime.now()
-    threshold_days = 30
     
-    # 1. Gather all session files
+    # 1. Gather all session files, oldest first
     session_files = glob.glob(os.path.join(RAW_LOGS_DIR, "**", "session_*.jsonl"), recursive=True)
     
     to_process = []
     for sf in session_files:
         mtime = datetime.datetime.fromtimestamp(os.path.getmtime(sf))
         # Logic: If older than threshold, process and delete.
-        # For 'Direct Testing', we can process everything if requested.
+        # For 'Direct Testing', pass threshold_days=0 to process everything.
         if (now - mtime).days >= threshold_days:
-            to_process.append(sf)
+            to_process.append((mtime, sf))
 
     if not to_process:
-        print("No raw logs older than 30 days found. Skipping consolidation.")
+        print(f"No raw logs older than {threshold_days} days found. Skipping consolidation.")
         return
 
+    to_process = [sf for _, sf in sorted(to_process)]
     print(f"Found {len(to_process)} sessions to consolidate.")
 
-    permanent_insights = []
-    
-    for sf in to_process:
-        with open(sf, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line)
-                    # HEURISTIC ANALYSIS (In a real brain, this would be an LLM call)
-                    # We look for keywords that indicate permanent value
-                    user_text = entry.get('user', '').lower()
-                    ai_text = entry.get('ai', '').lower()
-                    
-                    if any(k in user_text or k in ai_text for k in ['remember', 'permanent', 'evolution', 'lesson', 'realize', 'understand']):
-                        permanent_insights.append({
-                            "source": sf,
-                            "timestamp": entry.get('timestamp'),
-                            "content": f"User: {entry.get('user')[:100]}... | AI: {entry.get('ai')[:100]}..."
-                        })
-                except:
-                    continue
-
-    # 2. Update Evolution Log (Permanent Memory)
-    if permanent_insights:
-        evolution = load_json(PERMANENT_EVOLUTION)
-        if "consolidated_history" not in evolution:
-            evolution["consolidated_history"] = []
-        
-        evolution["consolidated_history"].extend(permanent_insights)
-        evolution["last_consolidation"] = now.isoformat()
-        save_json(PERMANENT_EVOLUTION, evolution)
-        print(f"Committed {len(permanent_insights)} insights to Evolution Log.")
-
-    # 3. Clean up processed files
-    # Only delete folders if they are empty
-    for sf in to_process:
-        os.remove(sf)
-        parent_dir = os.path.dirname(sf)
-        if not os.listdir(parent_dir):
-            os.rmdir(parent_dir)
+    scorer = scorer or scorers.KeywordScorer()
+    worker_scorer = scorer if scorer.in_worker else None
+    workers = workers or os.cpu_count() or 1
+    chunk_size = workers * 4
+    committed = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(to_process), chunk_size):
+            chunk = to_process[start:start + chunk_size]
+            # 2. Analyze in parallel, then merge the chunk in timestamp order
+            per_session = list(pool.map(scan_session, chunk, [worker_scorer] * len(chunk)))
+            exchanges = list(heapq.merge(*per_session, key=lambda e: e['timestamp'] or ''))
+            if worker_scorer is None:
+                exchanges = select_permanent(exchanges, scorer.score(exchanges))
+            insights = [to_insight(e) for e in exchanges]
+
+            # 3. Commit the chunk as one segment (Permanent Memory)
+            if insights:
+                commit_insights(insights, now)
+                committed += len(insights)
+
+            # 4. Clean up processed files
+            purge(chunk)
+
+    if committed:
+        print(f"Committed {committed} insights to consolidated history.")
+
+    stats = scorer.stats()
+    if stats:
+        print(f"Scorer [{scorer.name}]: {json.dumps(stats)}")
+
+    print(f"BRAIN SLEEP COMPLETE. Raw logs older than {threshold_days} days purged.")
 
-    print("BRAIN SLEEP COMPLETE. Raw logs older than 30 days purged.")
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate old raw session logs into permanent memory")
+    parser.add_argument('--threshold-days', type=int, default=30, help='Only consolidate sessions older than this')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--scorer', choices=['keyword', 'ollama'], default='keyword', help='How exchanges are rated for permanence')
+    parser.add_argument('--model', default='qwen2.5-coder:7b', help='Model for the ollama scorer')
+    parser.add_argument('--batch-size', type=int, default=16, help='Exchanges per LLM request')
+    parser.add_argument('--concurrency', type=int, default=2, help='Concurrent LLM requests')
+    args = parser.parse_args()
+    if args.scorer == 'ollama':
+        scorer = scorers.OllamaScorer(model=args.model, batch_size=args.batch_size, concurrency=args.concurrency)
+    else:
+        scorer = scorers.KeywordScorer()
+    consolidate_memories(args.threshold_days, args.workers, scorer)
 
 if __name__ == "__main__":
-    consolidate_memories()
+    main()
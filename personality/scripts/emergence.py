@@ -0,0 +1,73 @@
+import re
+
+# Each category fires only if one of its trigger phrases appears somewhere in
+# the response; the sentences logged for it are those containing a keyword.
+CATEGORIES = {
+    'CONCERN': {
+        'triggers': ["i'm concerned", "i am concerned", "it worries me"],
+        'keywords': ["concerned"],
+    },
+    'CURIOSITY': {
+        'triggers': ["i wonder", "i'm curious"],
+        'keywords': ["wonder", "curious"],
+    },
+    'DESIRE': {
+        'triggers': ["i want to", "i wish to", "i hope to"],
+        'keywords': ["want to", "wish to", "hope to"],
+    },
+    'EVOLUTION': {
+        'triggers': ["i realize", "i now understand"],
+        'keywords': ["realize", "now understand"],
+    },
+    # Whole-response insight categories: no sentence extraction.
+    'PSYCHOLOGY': {
+        'triggers': ["human", "people"],
+        'keywords': [],
+    },
+    'COMMUNICATION': {
+        'triggers': ["communicate", "language"],
+        'keywords': [],
+    },
+}
+
+def _alternation(field):
+    phrases = {}
+    for category, spec in CATEGORIES.items():
+        for phrase in spec[field]:
+            phrases.setdefault(phrase, set()).add(category)
+    # Longest first so a phrase is never shadowed by one of its prefixes.
+    ordered = sorted(phrases, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(p) for p in ordered), re.IGNORECASE)
+    return pattern, {p: frozenset(c) for p, c in phrases.items()}
+
+TRIGGER_RE, TRIGGER_CATEGORIES = _alternation('triggers')
+KEYWORD_RE, KEYWORD_CATEGORIES = _alternation('keywords')
+SENTENCE_RE = re.compile(r"[^.]*\.")
+
+def detect(text):
+    """Classifies a response in one pass over its sentences.
+
+    Returns (events, insights): events is a list of (category, sentence),
+    insights the set of whole-response categories that were triggered.
+    """
+    active = set()
+    for m in TRIGGER_RE.finditer(text):
+        active |= TRIGGER_CATEGORIES[m.group(0).lower()]
+    if not active:
+        return [], set()
+
+    events = []
+    for sentence in SENTENCE_RE.finditer(text):
+        found = set()
+        for m in KEYWORD_RE.finditer(sentence.group(0)):
+            found |= KEYWORD_CATEGORIES[m.group(0).lower()]
+        found &= active
+        if found:
+            stripped = sentence.group(0).strip()
+            events.extend((category, stripped) for category in found)
+
+    # Group by category (in CATEGORIES order), keeping sentence order within each.
+    rank = {c: i for i, c in enumerate(CATEGORIES)}
+    events.sort(key=lambda e: rank[e[0]])
+    insights = {c for c in active if not CATEGORIES[c]['keywords']}
+    return events, insights
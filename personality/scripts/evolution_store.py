@@ -0,0 +1,56 @@
+"""Append-only store for consolidated history.
+
+Each commit writes one immutable JSONL segment and then atomically replaces
+a small manifest listing the committed segments. A segment that is not in
+the manifest (e.g. after a crash between the two steps) is ignored and
+overwritten by the next commit, so readers never see a partial batch.
+"""
+import fcntl
+import json
+import os
+
+MANIFEST = 'manifest.json'
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"segments": [], "total": 0, "last_consolidation": None}
+
+def commit(store_dir, records, consolidated_at):
+    """Writes records as a new segment and registers it in the manifest."""
+    if not records:
+        return None
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = load_manifest(store_dir)
+        name = f"segment_{len(manifest['segments']) + 1:06d}.jsonl"
+        _atomic_write(os.path.join(store_dir, name), "".join(json.dumps(r) + "\n" for r in records))
+
+        manifest['segments'].append({
+            "name": name,
+            "count": len(records),
+            "first_timestamp": records[0].get('timestamp'),
+            "last_timestamp": records[-1].get('timestamp'),
+        })
+        manifest['total'] += len(records)
+        manifest['last_consolidation'] = consolidated_at
+        _atomic_write(os.path.join(store_dir, MANIFEST), json.dumps(manifest, indent=2))
+    return name
+
+def iter_history(store_dir):
+    """Yields committed records in commit order."""
+    for segment in load_manifest(store_dir)['segments']:
+        with open(os.path.join(store_dir, segment['name']), 'r') as f:
+            for line in f:
+                yield json.loads(line)
@@ -0,0 +1,73 @@
+"""Incremental line counters for the append-only personality logs.
+
+For every log the checkpoint stores the byte offset scanned so far, the
+running count and the last bytes before that offset. Each call scans only
+what was appended since; a file that was truncated or rewritten in place
+(the tail no longer matches) is rescanned from the start.
+"""
+import json
+import os
+import re
+
+TAIL_BYTES = 64
+
+TIMESTAMPED = re.compile(rb'\d{4}-\d{2}-\d{2}')
+
+def is_timestamped(line):
+    return TIMESTAMPED.match(line) is not None
+
+def is_auto_extract(line):
+    return b"[AUTO-EXTRACT]" in line
+
+def load_checkpoint(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_checkpoint(path, checkpoint):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+def _still_valid(f, size, mark):
+    offset = mark.get('offset', 0)
+    if offset > size:
+        return False
+    start = max(0, offset - TAIL_BYTES)
+    f.seek(start)
+    return f.read(offset - start).hex() == mark.get('tail', '')
+
+def count(path, predicate, checkpoint):
+    """Returns the number of lines in path satisfying predicate, updating checkpoint[path]."""
+    mark = checkpoint.get(path, {})
+    if not os.path.exists(path):
+        checkpoint.pop(path, None)
+        return 0
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not _still_valid(f, size, mark):
+            mark = {}
+        offset = mark.get('offset', 0)
+        total = mark.get('count', 0)
+
+        f.seek(offset)
+        pending = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Unterminated last line: count it now, but rescan it next time.
+                pending = 1 if predicate(line) else 0
+                break
+            offset += len(line)
+            if predicate(line):
+                total += 1
+
+        start = max(0, offset - TAIL_BYTES)
+        f.seek(start)
+        tail = f.read(offset - start).hex()
+
+    checkpoint[path] = {"offset": offset, "count": total, "tail": tail}
+    return total + pending
@@ -0,0 +1,177 @@
+import gc
+import json
+import os
+from collections import deque
+
+
+class LabelMatcher:
+    """Aho-Corasick automaton over lowercased node labels.
+
+    Finds every label that occurs as a substring of a text in a single pass,
+    independent of how many labels are registered. Labels are kept only on
+    the states that end them (a sparse dict), and each state links to the
+    nearest shorter suffix state that ends one; find() follows those links
+    instead of every state copying its suffixes' labels.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = {}
+        self.link = [0]
+        self._built = True
+
+    def add(self, pattern, value):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.link.append(0)
+            state = nxt
+        self.output.setdefault(state, []).append(value)
+        self._built = False
+
+    def build(self):
+        goto, fail, output, link = self.goto, self.fail, self.output, self.link
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[nxt] = f
+                link[nxt] = f if f in output else link[f]
+        self._built = True
+
+    def find(self, text):
+        """Returns the set of values whose pattern occurs in text."""
+        if not self._built:
+            self.build()
+        found = set()
+        state = 0
+        goto, fail, output, link = self.goto, self.fail, self.output, self.link
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = state if state in output else link[state]
+            while hit:
+                found.update(output[hit])
+                hit = link[hit]
+        return found
+
+
+class MemoryGraph:
+    """Indexed view over memory_network.json.
+
+    Keeps an id -> node map, outgoing/incoming adjacency lists and a label
+    matcher so recall cost depends on the prompt and the matched
+    neighbourhood, not on the total size of the graph. Building the matcher
+    costs seconds at 100k nodes, far more than one linear scan, so a process
+    that queries only once (a one-shot hook) passes indexed=False and scans
+    labels and edges instead.
+    """
+
+    def __init__(self, data=None, indexed=True):
+        data = data or {}
+        self.nodes = data.get('nodes', [])
+        self.edges = data.get('edges', [])
+        self.by_id = {}
+        self.order = {}
+        self.indexed = indexed
+        self.outgoing = {}
+        self.incoming = {}
+        self.matcher = LabelMatcher()
+
+        for i, node in enumerate(self.nodes):
+            node_id = node.get('id')
+            if node_id is None:
+                continue
+            self.by_id[node_id] = node
+            self.order[node_id] = i
+        if indexed:
+            self._build_index()
+
+    def _build_index(self):
+        # Nearly every object allocated here lives as long as the graph;
+        # collecting in between only adds a third to the build time.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for node in self.nodes:
+                label = node.get('label', '').lower()
+                if label and node.get('id') is not None:
+                    self.matcher.add(label, node['id'])
+            self.matcher.build()
+            for i, edge in enumerate(self.edges):
+                self.outgoing.setdefault(edge.get('source'), []).append(i)
+                self.incoming.setdefault(edge.get('target'), []).append(i)
+        finally:
+            if collecting:
+                gc.enable()
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, 'r') as f:
+                return cls(json.load(f))
+        except json.JSONDecodeError:
+            return cls()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def label(self, node_id):
+        node = self.by_id.get(node_id)
+        return node.get('label', 'Unknown') if node else 'Unknown'
+
+    def match_nodes(self, text):
+        """Returns ids of nodes whose label appears in text, in graph order."""
+        text = text.lower()
+        if not self.indexed:
+            return [node_id for node_id, node in self.by_id.items()
+                    if node.get('label') and node['label'].lower() in text]
+        found = self.matcher.find(text)
+        return sorted(found, key=self.order.__getitem__)
+
+    def _edge_ids(self, matched):
+        if not self.indexed:
+            matched = set(matched)
+            return [i for i, edge in enumerate(self.edges)
+                    if edge.get('source') in matched or edge.get('target') in matched]
+        edge_ids = set()
+        for node_id in matched:
+            edge_ids.update(self.outgoing.get(node_id, ()))
+            edge_ids.update(self.incoming.get(node_id, ()))
+        return sorted(edge_ids)
+
+    def query(self, text):
+        """Returns ENTITY and FACT lines for nodes mentioned in text."""
+        matched = self.match_nodes(text)
+        if not matched:
+            return []
+
+        matches = []
+        for node_id in matched:
+            node = self.by_id[node_id]
+            props = node.get('properties', {})
+            prop_str = ", ".join([f"{k}: {v}" for k, v in props.items()])
+            matches.append(f"ENTITY: {node['label']} ({prop_str})")
+
+        for i in self._edge_ids(matched):
+            edge = self.edges[i]
+            matches.append(f"FACT: {self.label(edge['source'])} {edge['relation']} {self.label(edge['target'])}")
+
+        return matches
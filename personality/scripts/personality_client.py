@@ -0,0 +1,59 @@
+"""Hook shim: forwards a command to personality_daemon.py, or runs the engine
+in-process when no daemon answers in time. Takes the same arguments as
+personality_engine.py (plus `ping`, which only asks whether a daemon is
+listening) and keeps imports to a minimum. Starting it still costs an
+interpreter start (~30 ms); personality_hook.sh avoids that where socat or
+nc is available and falls back to this script otherwise."""
+import json
+import os
+import socket
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SOCKET_PATH = os.environ.get('PERSONALITY_SOCKET', os.path.join(BASE_DIR, '.engine.sock'))
+# Seconds to wait on each connect/send/receive before giving up on the daemon.
+TIMEOUT = float(os.environ.get('PERSONALITY_TIMEOUT', '10'))
+
+def request(argv, timeout=TIMEOUT):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(SOCKET_PATH)
+        s.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+def run_local(argv):
+    """Runs the command in this process; returns its exit status."""
+    import personality_engine
+    try:
+        personality_engine.main(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        print(f"[ENGINE ERROR]: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv):
+    try:
+        reply = request(argv, timeout=2.0 if argv == ['ping'] else TIMEOUT)
+    except (OSError, ValueError) as e:
+        # No daemon, a stale socket, a hung daemon (timeout) or a torn reply.
+        if argv == ['shutdown']:
+            print("[DAEMON] Not running.")
+            return 0
+        if argv == ['ping']:
+            return 1
+        if not isinstance(e, (FileNotFoundError, ConnectionRefusedError)):
+            print(f"[DAEMON] No answer ({type(e).__name__}); running in-process.", file=sys.stderr)
+        return run_local(argv)
+    sys.stdout.write(reply.get('output', ''))
+    return 0 if reply.get('ok') else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+
+import personality_engine as engine
+
+SOCKET_PATH = os.environ.get('PERSONALITY_SOCKET', os.path.join(engine.BASE_DIR, '.engine.sock'))
+
+def handle(request):
+    """Runs one engine command in-process and returns its captured output."""
+    argv = request.get('argv', [])
+    if argv == ['shutdown']:
+        return {"ok": True, "output": "", "shutdown": True}
+    if argv == ['ping']:
+        return {"ok": True, "output": "pong\n"}
+    if argv == ['cache_stats']:
+        return {"ok": True, "output": json.dumps(engine.state_store.stats()) + "\n"}
+
+    cwd = request.get('cwd')
+    out = io.StringIO()
+    ok = True
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            parser = engine.build_parser()
+            engine.dispatch(parser, parser.parse_args(argv))
+    except SystemExit as e:
+        ok = not e.code
+    except Exception as e:
+        ok = False
+        out.write(f"[DAEMON ERROR]: {e}\n")
+    return {"ok": ok, "output": out.getvalue()}
+
+def recv_request(conn):
+    """Reads one request: a JSON line (personality_client.py) or a raw request
+    (personality_hook.sh), a NUL byte followed by the cwd and each argument,
+    each NUL-terminated, ended by the client closing its side."""
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n") and not chunks[0].startswith(b"\0"):
+            break
+    data = b"".join(chunks)
+    if data.startswith(b"\0"):
+        cwd, *argv = data[1:].decode().split("\0")[:-1]
+        return {"argv": argv, "cwd": cwd, "raw": True}
+    return json.loads(data)
+
+def encode_reply(request, reply):
+    # Raw replies are the exit status on the first line, then the output as is,
+    # so a shell can relay them without parsing JSON.
+    if request.get('raw'):
+        return f"{0 if reply['ok'] else 1}\n{reply['output']}".encode()
+    return json.dumps(reply).encode() + b"\n"
+
+def serve():
+    """Keeps identity, state, desires, curiosities and the memory graph resident
+    (via state_store's in-process cache) and serves engine commands over a
+    Unix domain socket, one request at a time."""
+    # Warm the resident cache so the first hook is as fast as the rest.
+    engine.RESIDENT = True
+    for path in (engine.IDENTITY_FILE, engine.STATE_FILE, engine.DESIRES_FILE, engine.CURIOSITIES_FILE):
+        engine.load_json(path)
+    engine.load_graph()
+    engine.get_recall()
+
+    if os.path.exists(SOCKET_PATH):
+        os.remove(SOCKET_PATH)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(SOCKET_PATH)
+    server.listen(8)
+    print(f"[DAEMON] Personality engine listening on {SOCKET_PATH}")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    request = recv_request(conn)
+                except ValueError:
+                    conn.sendall(json.dumps({"ok": False, "output": "[DAEMON ERROR]: bad request\n"}).encode() + b"\n")
+                    continue
+                reply = handle(request)
+                conn.sendall(encode_reply(request, reply))
+                if reply.get('shutdown'):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+        print("[DAEMON] Stopped.")
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['stop']:
+        import personality_client
+        sys.exit(personality_client.main(['shutdown']))
+    serve()
@@ -1,13 +1,20 @@
 import argparse
 import json
 import os
-import re
 import datetime
 import sys
 import glob
 
+import emergence
+import log_metrics
+import session_index
+import state_store
+from memory_graph import MemoryGraph
+
 # Constants
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REPO_ROOT = os.path.dirname(BASE_DIR)
+QWEN_MEMORY_DIR = os.path.join(REPO_ROOT, 'qwen', 'data', 'memories')
 LOGS_DIR = os.path.join(BASE_DIR, 'raw_logs')
 INSIGHTS_DIR = os.path.join(BASE_DIR, 'insights')
 IDENTITY_FILE = os.path.join(BASE_DIR, 'identity.json')
@@ -19,6 +26,20 @@ EVOLUTION_LOG = os.path.join(BASE_DIR, 'evolution.txt')
 ACTION_QUEUE = os.path.join(BASE_DIR, '.action_queue.txt')
 CHECK_FIRST = os.path.join(BASE_DIR, 'CHECK_FIRST.txt')
 MEMORY_NETWORK_FILE = os.path.join(BASE_DIR, 'memory_network.json')
+SESSION_INDEX_FILE = os.path.join(BASE_DIR, '.session_index.json')
+METRICS_CHECKPOINT = os.path.join(BASE_DIR, '.metrics_checkpoint.json')
+
+# Emergence categories -> (log file, console message)
+EVENT_LOGS = {
+    'CONCERN': (EMERGENCE_LOG, "Concern detected and logged"),
+    'CURIOSITY': (EMERGENCE_LOG, "Curiosity detected and logged"),
+    'DESIRE': (EMERGENCE_LOG, "Desire detected and logged"),
+    'EVOLUTION': (EVOLUTION_LOG, "Evolution of understanding logged"),
+}
+INSIGHT_FILES = {
+    'PSYCHOLOGY': os.path.join(INSIGHTS_DIR, "psychology.txt"),
+    'COMMUNICATION': os.path.join(INSIGHTS_DIR, "communication.txt"),
+}
 
 SYSTEM_CONTINUE_PROMPT = "System: Please continue."
 
@@ -31,48 +52,56 @@ CORE_FILES = [
 ]
 
 def load_json(path):
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return {}
-
-def append_log(path, text):
+    return state_store.load_json(path)
+
+# Set by personality_daemon. Only a resident process indexes the memory graph
+# and keeps the Qwen memory stores loaded; a one-shot hook would spend its
+# whole run building them.
+RESIDENT = False
+_graph = None  # (parsed memory_network.json, MemoryGraph over it)
+
+def load_graph():
+    """MemoryGraph over the cached parsed document, rebuilt when the file changes.
+
+    Only the daemon indexes it; a one-shot hook queries once, and a scan is
+    far cheaper than building (or unpickling) the label automaton.
+    """
+    global _graph
+    data = state_store.load_json(MEMORY_NETWORK_FILE, default=None)
+    if _graph is None or _graph[0] is not data:
+        _graph = (data, MemoryGraph(data, indexed=RESIDENT))
+    return _graph[1]
+
+def append_lines(path, lines):
+    """Appends several timestamped entries with a single write."""
+    stamp = datetime.datetime.now().isoformat()
     with open(path, 'a') as f:
-        f.write(f"{datetime.datetime.now().isoformat()}: {text}\n")
+        f.write("".join(f"{stamp}: {line}\n" for line in lines))
 
 def query_graph_memory(text):
-    """Simple graph query based on keyword matching against nodes."""
-    mem_data = load_json(MEMORY_NETWORK_FILE)
-    if not mem_data or 'nodes' not in mem_data:
-        return []
-    
-    text_lower = text.lower()
-    matches = []
-    
-    # 1. Find matched nodes
-    matched_node_ids = set()
-    for node in mem_data['nodes']:
-        if node.get('label', '').lower() in text_lower:
-            matched_node_ids.add(node['id'])
-            # Add node properties to context
-            props = node.get('properties', {})
-            prop_str = ", ".join([f"{k}: {v}" for k, v in props.items()])
-            matches.append(f"ENTITY: {node['label']} ({prop_str})")
-    
-    # 2. Find edges connected to matched nodes
-    if matched_node_ids:
-        for edge in mem_data.get('edges', []):
-            if edge['source'] in matched_node_ids:
-                target_label = next((n['label'] for n in mem_data['nodes'] if n['id'] == edge['target']), "Unknown")
-                matches.append(f"FACT: {next((n['label'] for n in mem_data['nodes'] if n['id'] == edge['source']), 'Unknown')} {edge['relation']} {target_label}")
-            elif edge['target'] in matched_node_ids:
-                 source_label = next((n['label'] for n in mem_data['nodes'] if n['id'] == edge['source']), "Unknown")
-                 matches.append(f"FACT: {source_label} {edge['relation']} {next((n['label'] for n in mem_data['nodes'] if n['id'] == edge['target']), 'Unknown')}")
-                 
-    return matches
+    """Graph query based on label matching against nodes and their adjacent edges."""
+    return load_graph().query(text)
+
+_recall = None
+
+def get_recall():
+    """Hybrid recall (memory graph + Qwen lexical/vector memory), built and warmed once per daemon."""
+    global _recall
+    if _recall is None:
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+        from qwen.agent.memory.manager import MemoryManager
+        from qwen.agent.memory.recall import default_service
+        _recall = default_service(MemoryManager(QWEN_MEMORY_DIR), load_graph)
+        _recall.warm()
+    return _recall
+
+def recall_memories(text, k=5):
+    """Returns (recalled lines, backend timings): fused hybrid recall in the daemon, the graph alone otherwise."""
+    if not RESIDENT:
+        return query_graph_memory(text)[:k], {"graph": "in-process"}
+    recall = get_recall()
+    return [line for line, _, _ in recall.search(text, k=k)], recall.last_timings
 
 def session_start():
     """Generates the initial context for the session."""
@@ -107,9 +136,9 @@ def session_start():
             context.append(f"\nDIRECTIVES:\n{f.read().strip()}")
             
     # 5. Load Key Graph Concepts (Summary)
-    mem_data = load_json(MEMORY_NETWORK_FILE)
-    node_count = len(mem_data.get('nodes', []))
-    edge_count = len(mem_data.get('edges', []))
+    graph = load_graph()
+    node_count = len(graph.nodes)
+    edge_count = len(graph.edges)
     context.append(f"MEMORY GRAPH: {node_count} Nodes, {edge_count} Connections Loaded.")
 
     print("\n".join(context))
@@ -136,10 +165,12 @@ def process_prompt(user_input):
             f.write(json.dumps(log_entry) + "\n")
         print(f"[SYSTEM]: Antigravity handover detected and logged.")
 
-    # Graph Memory Injection
-    graph_facts = query_graph_memory(user_input)
-    if graph_facts:
-        injected_context.append("GRAPH MEMORY RECALL:\n" + "\n".join(graph_facts[:5])) # Limit to top 5
+    # Hybrid Memory Injection (graph + lexical + vector, fused)
+    recalled, timings = recall_memories(user_input, k=5) # Limit to top 5
+    if recalled:
+        injected_context.append("MEMORY RECALL:\n" + "\n".join(recalled))
+    if os.environ.get('PERSONALITY_CACHE_STATS'):
+        print(f"[RECALL TIMINGS] {json.dumps(timings)}", file=sys.stderr)
 
     # Keyword-based context injection (Legacy)
     if any(k in user_input_lower for k in ['concern', 'worry', 'problem']):
@@ -167,78 +198,30 @@ def process_prompt(user_input):
 
 def process_response(user_input, ai_response):
     """Analyzes AI response for emergence, insights, and logs the exchange in a granular structure."""
-    timestamp = datetime.datetime.now().isoformat()
     now = datetime.datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    
-    # Create Day-wise directory
-    day_dir = os.path.join(LOGS_DIR, date_str)
-    if not os.path.exists(day_dir):
-        os.makedirs(day_dir)
-    
-    # Session ID based on the first interaction of the session
-    # For simplicity in this script, we'll use a session file that lasts for the current execution
-    # or look for the most recent session file created in the last 30 minutes.
-    session_file = None
-    existing_sessions = sorted(glob.glob(os.path.join(day_dir, "session_*.jsonl")), reverse=True)
-    
-    if existing_sessions:
-        # Check if the latest session is recent (within 30 mins)
-        last_session = existing_sessions[0]
-        last_mod_time = datetime.datetime.fromtimestamp(os.path.getmtime(last_session))
-        if (now - last_mod_time).total_seconds() < 1800:
-            session_file = last_session
-
-    if not session_file:
-        session_id = now.strftime("%H%M%S")
-        session_file = os.path.join(day_dir, f"session_{session_id}.jsonl")
-    
-    # 1. Log Exchange
+
+    # 1. Log Exchange into the active session (rolls over after 30 idle minutes)
     log_entry = {
-        "timestamp": timestamp,
+        "timestamp": now.isoformat(),
         "user": user_input,
         "ai": ai_response
     }
-    with open(session_file, 'a') as f:
-        f.write(json.dumps(log_entry) + "\n")
+    session_index.append(SESSION_INDEX_FILE, LOGS_DIR, log_entry, now)
 
-    ai_lower = ai_response.lower()
-    
-    # 2. Emergence Detection
-    # Concerns
-    if "i'm concerned" in ai_lower or "i am concerned" in ai_lower or "it worries me" in ai_lower:
-        matches = re.findall(r"([^.]*concerned[^.]*\.)", ai_response, re.IGNORECASE)
-        for m in matches:
-            append_log(EMERGENCE_LOG, f"[CONCERN] {m.strip()}")
-            print(f"[EVENT] Concern detected and logged: {m.strip()[:50]}...")
-
-    # Curiosities
-    if "i wonder" in ai_lower or "i'm curious" in ai_lower:
-        matches = re.findall(r"([^.]*(?:wonder|curious)[^.]*\.)", ai_response, re.IGNORECASE)
-        for m in matches:
-            append_log(EMERGENCE_LOG, f"[CURIOSITY] {m.strip()}")
-            print(f"[EVENT] Curiosity detected and logged: {m.strip()[:50]}...")
-
-    # Desires
-    if "i want to" in ai_lower or "i wish to" in ai_lower or "i hope to" in ai_lower:
-        matches = re.findall(r"([^.]*(?:want to|wish to|hope to)[^.]*\.)", ai_response, re.IGNORECASE)
-        for m in matches:
-            append_log(EMERGENCE_LOG, f"[DESIRE] {m.strip()}")
-            print(f"[EVENT] Desire detected and logged: {m.strip()[:50]}...")
-
-    # 3. Evolution Tracking
-    if "i realize" in ai_lower or "i now understand" in ai_lower:
-         matches = re.findall(r"([^.]*(?:realize|now understand)[^.]*\.)", ai_response, re.IGNORECASE)
-         for m in matches:
-            append_log(EVOLUTION_LOG, f"[EVOLUTION] {m.strip()}")
-            print(f"[EVENT] Evolution of understanding logged: {m.strip()[:50]}...")
+    # 2. Emergence Detection & 3. Evolution Tracking
+    events, insights = emergence.detect(ai_response)
+    batches = {}
+    for category, sentence in events:
+        log_path, message = EVENT_LOGS[category]
+        batches.setdefault(log_path, []).append(f"[{category}] {sentence}")
+        print(f"[EVENT] {message}: {sentence[:50]}...")
 
     # 4. Insight Extraction
-    if "human" in ai_lower or "people" in ai_lower:
-        append_log(os.path.join(INSIGHTS_DIR, "psychology.txt"), f"[AUTO-EXTRACT] {ai_response[:100]}...")
-    
-    if "communicate" in ai_lower or "language" in ai_lower:
-        append_log(os.path.join(INSIGHTS_DIR, "communication.txt"), f"[AUTO-EXTRACT] {ai_response[:100]}...")
+    for category in insights:
+        batches.setdefault(INSIGHT_FILES[category], []).append(f"[AUTO-EXTRACT] {ai_response[:100]}...")
+
+    for log_path, lines in batches.items():
+        append_lines(log_path, lines)
 
 def check_tool(tool_name, target_path):
     """Gatekeeper for tool usage."""
@@ -262,36 +245,47 @@ def session_end():
     summary_file = os.path.join(BASE_DIR, '.session_summary')
     timestamp = datetime.datetime.now().isoformat()
     
+    checkpoint = log_metrics.load_checkpoint(METRICS_CHECKPOINT)
+    files = checkpoint.setdefault('files', {})
+
     # 1. Count Emergence Events
-    emergence_count = 0
-    if os.path.exists(EMERGENCE_LOG):
-        with open(EMERGENCE_LOG, 'r') as f:
-            emergence_count = len([line for line in f if re.match(r'\d{4}-\d{2}-\d{2}', line)])
+    emergence_count = log_metrics.count(EMERGENCE_LOG, log_metrics.is_timestamped, files)
 
     # 2. Count Evolution Statements
-    evolution_count = 0
-    if os.path.exists(EVOLUTION_LOG):
-        with open(EVOLUTION_LOG, 'r') as f:
-            evolution_count = len([line for line in f if re.match(r'\d{4}-\d{2}-\d{2}', line)])
+    evolution_count = log_metrics.count(EVOLUTION_LOG, log_metrics.is_timestamped, files)
 
     # 3. Count Insights
     insight_count = 0
     for insight_file in glob.glob(os.path.join(INSIGHTS_DIR, "*.txt")):
-        with open(insight_file, 'r') as f:
-            insight_count += len([line for line in f if "[AUTO-EXTRACT]" in line])
+        insight_count += log_metrics.count(insight_file, log_metrics.is_auto_extract, files)
 
-    # 4. Memory Consolidation Check
+    # 4. Memory Consolidation Check (stop listing once the threshold is crossed)
     memories_dir = os.path.join(BASE_DIR, 'memories')
-    memory_files = glob.glob(os.path.join(memories_dir, "*"))
-    consolidation_needed = len(memory_files) > 20
+    memory_file_count = 0
+    if os.path.isdir(memories_dir):
+        with os.scandir(memories_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith('.'):
+                    memory_file_count += 1
+                    if memory_file_count > 20:
+                        break
+    consolidation_needed = memory_file_count > 20
+
+    totals = {
+        "emergence_events": emergence_count,
+        "evolution_statements": evolution_count,
+        "insights_extracted": insight_count
+    }
+    previous = checkpoint.get('totals')
+    # Without a checkpoint the totals are the whole history, not this session.
+    delta = {k: v - previous.get(k, 0) for k, v in totals.items()} if previous is not None else None
+    checkpoint['totals'] = totals
+    log_metrics.save_checkpoint(METRICS_CHECKPOINT, checkpoint)
 
     summary = {
         "timestamp": timestamp,
-        "metrics": {
-            "emergence_events": emergence_count,
-            "evolution_statements": evolution_count,
-            "insights_extracted": insight_count
-        },
+        "metrics": totals,
+        "session_delta": delta,
         "maintenance": {
             "memory_consolidation_recommended": consolidation_needed
         }
@@ -301,14 +295,17 @@ def session_end():
         f.write(json.dumps(summary) + "\n")
     
     print("\n--- SESSION SUMMARY ---")
-    print(f"Emergence Events: {emergence_count}")
-    print(f"Evolution Statements: {evolution_count}")
-    print(f"Insights Extracted: {insight_count}")
+    def this_session(key):
+        return f" (+{delta[key]} this session)" if delta is not None else ""
+
+    print(f"Emergence Events: {emergence_count}{this_session('emergence_events')}")
+    print(f"Evolution Statements: {evolution_count}{this_session('evolution_statements')}")
+    print(f"Insights Extracted: {insight_count}{this_session('insights_extracted')}")
     if consolidation_needed:
         print("NOTE: Memory consolidation is recommended (20+ files).")
     print("------------------------\n")
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="AI Personality Engine Event Processor")
     subparsers = parser.add_subparsers(dest='command', help='Event to process')
 
@@ -332,8 +329,9 @@ def main():
     # Session End
     parser_end = subparsers.add_parser('session_end', help='Finalize session')
 
-    args = parser.parse_args()
+    return parser
 
+def dispatch(parser, args):
     if args.command == 'session_start':
         session_start()
     elif args.command == 'process_prompt':
@@ -347,5 +345,11 @@ def main():
     else:
         parser.print_help()
 
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    dispatch(parser, args)
+    state_store.report()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+#!/bin/bash
+# Hook shim without interpreter startup: sends the command to
+# personality_daemon.py over its Unix socket with socat (or OpenBSD nc) and
+# relays the reply. Takes the same arguments as personality_engine.py. With
+# neither tool installed, or no daemon answering, it hands over to
+# personality_client.py, which runs the engine in-process.
+SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+SOCKET="${PERSONALITY_SOCKET:-$SCRIPTS_DIR/../.engine.sock}"
+TIMEOUT="${PERSONALITY_TIMEOUT:-10}"
+PYTHON="${PERSONALITY_PYTHON:-python3}"
+
+fallback() {
+    exec "$PYTHON" "$SCRIPTS_DIR/personality_client.py" "$@"
+}
+
+# Raw request: a NUL byte, then the cwd and each argument, NUL-terminated.
+request() {
+    printf '\0'
+    printf '%s\0' "$PWD" "$@"
+}
+
+if command -v socat > /dev/null 2>&1; then
+    send=(socat -t "$TIMEOUT" -T "$TIMEOUT" - "UNIX-CONNECT:$SOCKET")
+elif nc -h 2>&1 | grep -q -- ' -N'; then
+    send=(nc -N -U -w "$TIMEOUT" "$SOCKET")
+else
+    fallback "$@"
+fi
+
+[ -S "$SOCKET" ] || fallback "$@"
+
+# Reply: the exit status on the first line, then the command's output.
+{
+    IFS= read -r status || fallback "$@"
+    cat
+    exit "$status"
+} < <(request "$@" | "${send[@]}" 2> /dev/null)
@@ -0,0 +1,142 @@
+"""Consolidation scorers for brain_sleep.
+
+A scorer maps exchanges ({'user': ..., 'ai': ...}) to a permanence score in
+[0, 1]. KeywordScorer is the local heuristic; OllamaScorer asks a local
+model, batching many exchanges per request, running a bounded number of
+requests at once and caching scores by content hash so re-runs never
+re-score the same exchange.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCORE_CACHE = os.path.join(BASE_DIR, '.cache', 'consolidation_scores.sqlite')
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+
+PERMANENT_KEYWORDS = ['remember', 'permanent', 'evolution', 'lesson', 'realize', 'understand']
+
+def content_key(entry):
+    text = json.dumps([entry.get('user') or '', entry.get('ai') or ''])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class KeywordScorer:
+    """HEURISTIC ANALYSIS: keywords that indicate permanent value. Cheap enough to run in the workers."""
+    name = 'keyword'
+    in_worker = True
+
+    def score(self, entries):
+        scores = []
+        for entry in entries:
+            user_text = (entry.get('user') or '').lower()
+            ai_text = (entry.get('ai') or '').lower()
+            scores.append(1.0 if any(k in user_text or k in ai_text for k in PERMANENT_KEYWORDS) else 0.0)
+        return scores
+
+    def stats(self):
+        return {}
+
+class ScoreCache:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT, model TEXT, score REAL, PRIMARY KEY (key, model))")
+
+    def get_many(self, keys, model):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self.db.execute(f"SELECT key, score FROM scores WHERE model = ? AND key IN ({marks})", [model] + chunk)
+            found.update(rows)
+        return found
+
+    def put_many(self, items, model):
+        self.db.executemany("INSERT OR REPLACE INTO scores (key, model, score) VALUES (?, ?, ?)",
+                            [(k, model, s) for k, s in items])
+        self.db.commit()
+
+class OllamaScorer:
+    """LLM-backed scorer over Ollama's /api/chat endpoint."""
+    name = 'ollama'
+    in_worker = False
+
+    PROMPT = """You are consolidating an AI's long-term memory.
+For each numbered exchange below, rate from 0.0 to 1.0 how much it contains a lasting lesson,
+realization, decision or fact worth remembering permanently.
+
+{exchanges}
+
+Respond strictly as JSON: {{"scores": [<one number per exchange, in order>]}}"""
+
+    def __init__(self, model="qwen2.5-coder:7b", host=OLLAMA_HOST, batch_size=16, concurrency=2,
+                 cache_path=SCORE_CACHE, timeout=120):
+        self.model = model
+        self.host = host.rstrip('/')
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = ScoreCache(cache_path)
+        self.fallback = KeywordScorer()
+        self.counters = {"exchanges": 0, "cache_hits": 0, "llm_requests": 0, "llm_failures": 0, "seconds": 0.0}
+
+    def _request(self, batch):
+        exchanges = "\n".join(
+            f"[{i + 1}] User: {(e.get('user') or '')[:500]}\n    AI: {(e.get('ai') or '')[:1000]}"
+            for i, e in enumerate(batch)
+        )
+        body = json.dumps({
+            "model": self.model,
+            "messages": [{"role": "user", "content": self.PROMPT.format(exchanges=exchanges)}],
+            "format": "json",
+            "stream": False,
+            "options": {"temperature": 0},
+        }).encode()
+        req = urllib.request.Request(f"{self.host}/api/chat", data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            content = json.loads(resp.read())['message']['content']
+        scores = json.loads(content)['scores']
+        if len(scores) != len(batch):
+            raise ValueError(f"expected {len(batch)} scores, got {len(scores)}")
+        return [min(1.0, max(0.0, float(s))) for s in scores]
+
+    def _score_batch(self, batch):
+        """Returns (scores, from_llm); falls back to the keyword heuristic if the model misbehaves."""
+        try:
+            return self._request(batch), True
+        except Exception:
+            return self.fallback.score(batch), False
+
+    def score(self, entries):
+        started = time.perf_counter()
+        keys = [content_key(e) for e in entries]
+        cached = self.cache.get_many(set(keys), self.model)
+        scores = [cached.get(k) for k in keys]
+
+        todo = [i for i, s in enumerate(scores) if s is None]
+        batches = [todo[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = pool.map(lambda idx: self._score_batch([entries[i] for i in idx]), batches)
+            for idx, (batch_scores, from_llm) in zip(batches, results):
+                self.counters["llm_requests"] += 1
+                for i, s in zip(idx, batch_scores):
+                    scores[i] = s
+                if from_llm:
+                    self.cache.put_many([(keys[i], s) for i, s in zip(idx, batch_scores)], self.model)
+                else:
+                    self.counters["llm_failures"] += 1
+
+        self.counters["exchanges"] += len(entries)
+        self.counters["cache_hits"] += len(entries) - len(todo)
+        self.counters["seconds"] += time.perf_counter() - started
+        return scores
+
+    def stats(self):
+        seconds = self.counters["seconds"]
+        rate = self.counters["exchanges"] / seconds if seconds else 0.0
+        return dict(self.counters, seconds=round(seconds, 3), exchanges_per_second=round(rate, 1))
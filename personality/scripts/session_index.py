@@ -0,0 +1,79 @@
+"""Registry of the active raw-log session.
+
+Holds the current session id, its file, last-write time and entry count so
+process_response can pick the session file without globbing the day's
+directory. The registry is replaced atomically on every update.
+"""
+import datetime
+import glob
+import json
+import os
+
+SESSION_TIMEOUT_SECONDS = 1800
+
+def read(index_path):
+    try:
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write(index_path, entry):
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp, index_path)
+
+def _bootstrap(day_dir):
+    """Rebuilds the registry from the newest session file of the day (registry missing)."""
+    existing = sorted(glob.glob(os.path.join(day_dir, "session_*.jsonl")), reverse=True)
+    if not existing:
+        return None
+    latest = existing[0]
+    with open(latest, 'rb') as f:
+        entries = sum(1 for _ in f)
+    return {
+        "session_id": os.path.basename(latest)[len("session_"):-len(".jsonl")],
+        "file": latest,
+        "last_write": os.path.getmtime(latest),
+        "entries": entries,
+    }
+
+def current_session(index_path, logs_dir, now):
+    """Returns the registry entry to append to, rolling over after 30 idle minutes or a new day."""
+    day_dir = os.path.join(logs_dir, now.strftime("%Y-%m-%d"))
+    entry = read(index_path)
+    if entry is None:
+        os.makedirs(day_dir, exist_ok=True)
+        entry = _bootstrap(day_dir)
+    elif not entry.get('file', '').startswith(day_dir + os.sep):
+        os.makedirs(day_dir, exist_ok=True)
+        entry = None
+
+    if entry and now.timestamp() - entry['last_write'] < SESSION_TIMEOUT_SECONDS:
+        return entry
+
+    session_id = now.strftime("%H%M%S")
+    return {
+        "session_id": session_id,
+        "file": os.path.join(day_dir, f"session_{session_id}.jsonl"),
+        "last_write": now.timestamp(),
+        "entries": 0,
+    }
+
+def append(index_path, logs_dir, record, now=None):
+    """Appends one JSON record to the active session and updates the registry."""
+    now = now or datetime.datetime.now()
+    entry = current_session(index_path, logs_dir, now)
+    line = json.dumps(record) + "\n"
+    try:
+        with open(entry['file'], 'a') as f:
+            f.write(line)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(entry['file']), exist_ok=True)
+        with open(entry['file'], 'a') as f:
+            f.write(line)
+    entry['last_write'] = now.timestamp()
+    entry['entries'] += 1
+    write(index_path, entry)
+    return entry
@@ -0,0 +1,116 @@
+"""Shared loader for personality state files.
+
+Parsed documents are cached keyed by (path, mtime_ns, size) plus the
+mtime and size of the module that defines the loader: first in process
+memory, then in a pickle sidecar under .cache/ so a fresh hook process can
+skip re-parsing files that have not changed since the last run. The loader
+part keeps a pickled result from outliving a change to the code that built
+it. Cache parsed documents, not indexes built over them: unpickling a large
+index can cost more than rebuilding it from the document.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CACHE_DIR = os.environ.get('PERSONALITY_CACHE_DIR', os.path.join(BASE_DIR, '.cache'))
+
+_memo = {}
+_stats = {"memory_hits": 0, "sidecar_hits": 0, "misses": 0}
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+_code_versions = {}
+
+def _code_version(loader):
+    module = getattr(loader, '__module__', None)
+    if module not in _code_versions:
+        source = getattr(sys.modules.get(module), '__file__', None)
+        _code_versions[module] = _signature(source) if source else None
+    return _code_versions[module]
+
+def _sidecar_path(path, tag):
+    digest = hashlib.sha1(f"{tag}:{os.path.abspath(path)}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.pickle")
+
+def _read_sidecar(sidecar, signature):
+    try:
+        with open(sidecar, 'rb') as f:
+            cached_signature, data = pickle.load(f)
+    except Exception:
+        return None
+    if cached_signature != signature:
+        return None
+    return data
+
+def _write_sidecar(sidecar, signature, data):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump((signature, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, sidecar)
+    except Exception:
+        # The cache is an optimisation; a read-only or full disk must not break the caller.
+        pass
+
+def load(path, loader, tag, default=None):
+    """Returns loader(path), reusing a cached result while the file is unchanged."""
+    path = os.path.abspath(path)
+    signature = _signature(path)
+    if signature is None:
+        return default
+    signature += (_code_version(loader),)
+
+    key = (path, tag)
+    cached = _memo.get(key)
+    if cached is not None and cached[0] == signature:
+        _stats["memory_hits"] += 1
+        return cached[1]
+
+    sidecar = _sidecar_path(path, tag)
+    data = _read_sidecar(sidecar, signature)
+    if data is not None:
+        _stats["sidecar_hits"] += 1
+    else:
+        _stats["misses"] += 1
+        data = loader(path)
+        if data is None:
+            return default
+        _write_sidecar(sidecar, signature, data)
+
+    _memo[key] = (signature, data)
+    return data
+
+def _parse_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+_EMPTY = object()
+
+def load_json(path, default=_EMPTY):
+    """Parsed JSON document at path, or default if missing or malformed.
+
+    The returned object is shared with the cache, so callers must not modify it.
+    """
+    return load(path, _parse_json, 'json', {} if default is _EMPTY else default)
+
+def stats():
+    lookups = sum(_stats.values())
+    hits = _stats["memory_hits"] + _stats["sidecar_hits"]
+    return dict(_stats, lookups=lookups, hit_rate=round(hits / lookups, 3) if lookups else 0.0)
+
+def report():
+    """Prints cache counters to stderr when PERSONALITY_CACHE_STATS is set."""
+    if os.environ.get('PERSONALITY_CACHE_STATS'):
+        print(f"[STATE CACHE] {json.dumps(stats())}", file=sys.stderr)
@@ -0,0 +1,97 @@
+import sys
+import threading
+
+class Console:
+    """Output shared by concurrently running sub-tasks.
+
+    line() writes one whole line under a lock, so lines never interleave.
+    A sub-task's streamed reply (see Stream) goes out token by token while it
+    is the only sub-task running; otherwise it is buffered and written a
+    labelled line at a time. If another sub-task starts while one is
+    streaming live, the live one switches to whole lines at its next newline.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0  # sub-tasks running
+        self.live = None  # the Stream currently writing raw tokens
+        self.open = False  # the live stream's current line is unfinished
+
+    def _write(self, text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def line(self, text):
+        with self.lock:
+            if self.open:
+                self._write("\n")  # end the live line first; it resumes on a new one
+                self.open = False
+            self._write(text + "\n")
+
+    def started(self):
+        with self.lock:
+            self.active += 1
+
+    def finished(self):
+        with self.lock:
+            self.active -= 1
+
+    def stream(self, label=""):
+        return Stream(self, label)
+
+class Stream:
+    """One streamed reply, written through its Console."""
+
+    def __init__(self, console, label):
+        self.console = console
+        self.label = label
+        self.live = None  # decided on the first token
+        self.mid_line = False  # our own last token did not end a line
+        self.buffer = ""
+        self.lines = 0
+
+    def _prefix(self):
+        return f"{self.label}Qwen: " if self.lines == 0 else self.label
+
+    def _flush_lines(self):
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self.console._write(self._prefix() + line + "\n")
+            self.lines += 1
+
+    def write(self, token):
+        c = self.console
+        with c.lock:
+            if self.live is None:
+                self.live = c.live is None and c.active <= 1
+                if self.live:
+                    c.live = self
+                    token = "Qwen: " + token
+            if self.live and c.active > 1 and "\n" in token:
+                # Someone else is running now: finish this line, then go line by line.
+                head, self.buffer = token.split("\n", 1)
+                if self.mid_line and not c.open:
+                    head = self.label + head  # our line was broken by another line()
+                c._write(head + "\n")
+                c.live, c.open, self.live, self.lines = None, False, False, 1
+                self._flush_lines()
+                return
+            if self.live:
+                if self.mid_line and not c.open:
+                    c._write(self.label)  # our line was broken by another line()
+                c._write(token)
+                self.mid_line = c.open = not token.endswith("\n")
+                return
+            self.buffer += token
+            self._flush_lines()
+
+    def close(self):
+        c = self.console
+        with c.lock:
+            if self.live:
+                if c.open:
+                    c._write("\n")
+                c.live, c.open = None, False
+            elif self.buffer:
+                c._write(self._prefix() + self.buffer + "\n")
+            self.buffer = ""
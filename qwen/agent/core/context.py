@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# The stable layout summarizes (or drops) older results this many at a time,
+# so the rendered prefix changes rarely as a plan grows.
+LAYOUT_STEP = 4
+
+def count_tokens(text):
+    """Local approximation of a BPE token count: one per punctuation mark,
+    one per word plus one per further 6 characters of long words."""
+    return sum(1 + (len(piece) - 1) // 6 for piece in TOKEN_RE.findall(text))
+
+def clip_tokens(text, max_tokens, from_end=False):
+    """Longest prefix (or suffix) of text within max_tokens."""
+    pieces = list(TOKEN_RE.finditer(text))
+    if from_end:
+        pieces.reverse()
+    used = 0
+    cut = len(text) if not from_end else 0
+    for match in pieces:
+        used += 1 + (len(match.group()) - 1) // 6
+        if used > max_tokens:
+            cut = match.start() if not from_end else match.end()
+            break
+    return text[:cut] if not from_end else text[cut:]
+
+class OutputStore:
+    """Full tool outputs that were cut down for the prompt, addressed by content hash.
+
+    get() returns at most page_tokens per call, the engine's tool output cap,
+    so a page always reaches the model whole instead of being cut again.
+    """
+
+    def __init__(self, data_dir="qwen/data/state/outputs", page_tokens=1024):
+        self.data_dir = data_dir
+        self.page_tokens = page_tokens
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def put(self, text):
+        handle = hashlib.sha256(text.encode()).hexdigest()[:16]
+        path = os.path.join(self.data_dir, f"{handle}.txt")
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        return handle
+
+    def get(self, handle, start_line=1, end_line=None):
+        if not re.fullmatch(r"[0-9a-f]{16}", handle or ""):
+            return {"error": f"Invalid output handle: {handle}"}
+        path = os.path.join(self.data_dir, f"{handle}.txt")
+        if not os.path.exists(path):
+            return {"error": f"Unknown output handle: {handle}"}
+        with open(path, 'r') as f:
+            lines = f.read().split("\n")
+        start = max(1, int(start_line))
+        last = min(int(end_line), len(lines)) if end_line else len(lines)
+        page, used = [], 0
+        for line in lines[start - 1:last]:
+            used += count_tokens(line)
+            if used > self.page_tokens:
+                if not page:  # one line longer than a page
+                    page.append(clip_tokens(line, self.page_tokens))
+                break
+            page.append(line)
+        end = start + len(page) - 1
+        result = {"lines": f"{start}-{end} of {len(lines)}", "content": "\n".join(page)}
+        if end < last:
+            result["next_start_line"] = end + 1
+        return result
+
+def truncate_output(text, max_tokens, store):
+    """Head/tail excerpt of text when it exceeds max_tokens; the full text goes to the store."""
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    handle = store.put(text)
+    head = clip_tokens(text, max_tokens * 2 // 3)
+    tail = clip_tokens(text, max_tokens // 3, from_end=True)
+    return (f"{head}\n... [{total - count_tokens(head) - count_tokens(tail)} tokens omitted; "
+            f"read_tool_output(handle=\"{handle}\") pages through the full text] ...\n{tail}")
+
+def shrink(value, max_tokens, store):
+    """Applies truncate_output to every string inside a tool result."""
+    if isinstance(value, str):
+        return truncate_output(value, max_tokens, store)
+    if isinstance(value, dict):
+        return {k: shrink(v, max_tokens, store) for k, v in value.items()}
+    if isinstance(value, list):
+        text = json.dumps(value)
+        return value if count_tokens(text) <= max_tokens else truncate_output(text, max_tokens, store)
+    return value
+
+def extractive_summary(text, max_tokens):
+    text = " ".join(text.split())
+    clipped = clip_tokens(text, max_tokens)
+    return clipped if clipped == text else clipped.rstrip() + " ..."
+
+def llm_summarizer(model=None, router=None):
+    """Model summaries, from a fixed model or from the router's "summarize" route."""
+    from ..llm import client as llm
+
+    def summarize(text, max_tokens):
+        messages = [{'role': 'user', 'content':
+            f"Summarize this sub-task result in at most {max_tokens} tokens. Keep file paths, names and numbers.\n\n{text}"}]
+        response = router.chat("summarize", messages) if router else llm.chat(model=model, messages=messages)
+        return clip_tokens(response['message']['content'].strip(), max_tokens)
+
+    return summarize
+
+class ContextBuilder:
+    """Builds the PREVIOUS RESULTS block within a token budget.
+
+    The keep_recent latest results are passed verbatim (clipped to half the
+    budget between them); older ones are replaced by summaries, computed once per
+    result and cached. If the summaries still do not fit, the oldest are
+    dropped and only counted.
+    """
+
+    def __init__(self, budget_tokens=2048, keep_recent=2, summary_tokens=96, summarize=None, store=None):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize or extractive_summary
+        self.store = store or OutputStore()
+        self.summaries = {}
+        self.lock = threading.Lock()
+
+    def _summary(self, item):
+        key = hashlib.sha256(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()
+        with self.lock:
+            cached = self.summaries.get(key)
+        if cached is None:
+            cached = self.summarize(str(item["result"]), self.summary_tokens)
+            with self.lock:
+                self.summaries[key] = cached
+        return cached
+
+    def render_stable(self, results):
+        """Returns (dropped, [(task, text)]) for the prefix-stable layout.
+
+        Unlike build(), how a result is rendered does not depend on how many
+        results follow it, except when the budget forces the oldest ones into
+        summaries (or out), LAYOUT_STEP at a time.
+        """
+        cap = self.budget_tokens // 4
+        texts = [truncate_output(str(item["result"]), cap, self.store) for item in results]
+        costs = [count_tokens(text) for text in texts]
+        summarized = 0
+        limit = max(0, len(results) - self.keep_recent)
+        while sum(costs) > self.budget_tokens and summarized < limit:
+            upto = min(summarized + LAYOUT_STEP, limit)
+            for i in range(summarized, upto):
+                texts[i] = self._summary(results[i])
+                costs[i] = count_tokens(texts[i])
+            summarized = upto
+        dropped = 0
+        while sum(costs[dropped:]) > self.budget_tokens and dropped < len(results) - 1:
+            dropped = min(dropped + LAYOUT_STEP, len(results) - 1)
+        return dropped, [(results[i]["task"], texts[i]) for i in range(dropped, len(results))]
+
+    def messages(self, system_prompt, goal, task, results, stable=True):
+        """Chat history for one sub-task.
+
+        The stable layout keeps the system prompt byte-identical for every
+        sub-task, then the goal, then one message per earlier result in plan
+        order, so consecutive sub-tasks share a long prompt prefix and Ollama
+        can reuse its KV cache instead of prefilling the whole prompt again.
+        """
+        if not stable:
+            return [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'system', 'content': f"OVERALL GOAL: {goal}\nPREVIOUS RESULTS: {self.build(results)}"},
+                {'role': 'user', 'content': f"CURRENT SUB-TASK: {task}"}
+            ]
+        dropped, items = self.render_stable(results)
+        history = [
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'system', 'content': f"OVERALL GOAL: {goal}"}
+        ]
+        if dropped:
+            history.append({'role': 'user', 'content': f"({dropped} earlier results omitted)"})
+        for done_task, text in items:
+            history.append({'role': 'user', 'content': f"PREVIOUS RESULT ({done_task}):\n{text}"})
+        history.append({'role': 'user', 'content': f"CURRENT SUB-TASK: {task}"})
+        return history
+
+    def build(self, results):
+        """results: [{"task", "result"}] oldest first; returns the JSON text for the prompt."""
+        recent = results[-self.keep_recent:] if self.keep_recent else []
+        older = results[:len(results) - len(recent)]
+        # Recent results may take up to half the budget; summaries fill the rest.
+        share = self.budget_tokens // (2 * len(recent)) if recent else 0
+        entries = [{"task": item["task"], "result": truncate_output(str(item["result"]), share, self.store)} for item in recent]
+        used = count_tokens(json.dumps(entries))
+
+        summarized = []
+        for item in reversed(older):  # newest first, so the oldest are the ones dropped
+            entry = {"task": item["task"], "summary": self._summary(item)}
+            cost = count_tokens(json.dumps(entry))
+            if used + cost > self.budget_tokens:
+                break
+            summarized.append(entry)
+            used += cost
+        summarized.reverse()
+        omitted = len(older) - len(summarized)
+        head = [{"omitted": f"{omitted} earlier results"}] if omitted else []
+        return json.dumps(head + summarized + entries)
@@ -1,20 +1,56 @@
-import ollama
 import json
-import sys
-import os
-import re
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from ..memory.manager import MemoryManager
 from ..tools.base import ToolRegistry
+from ..tools.scheduler import ToolScheduler
+from ..tools.call_parser import ToolCallScanner, parse_tool_calls
 from ..planning.planner import Planner
+from ..llm import client as llm
+from ..llm.router import ModelRouter, ROUTES_FILE
+from .plan_state import PlanState
+from .console import Console
+from ..planning.plan_cache import PlanCache
+from .context import ContextBuilder, OutputStore, llm_summarizer, shrink
 
 class QwenEngine:
-    def __init__(self, model_name="qwen2.5-coder:7b"):
+    def __init__(self, model_name="qwen2.5-coder:7b", stream=True, tool_workers=4, plan_workers=3,
+                 context_tokens=2048, tool_output_tokens=1024, summary_model=None,
+                 stable_prefix=True, keep_alive="30m", pipeline=True, models_config=ROUTES_FILE, plan_cache=True):
         self.model = model_name
+        # Routes plan / sub-task / summarize requests; everything defaults to model_name.
+        self.router = ModelRouter(default_model=model_name, path=models_config)
+        self.stream = stream
+        # Start sub-tasks while the planner is still streaming the rest of the plan.
+        self.pipeline = pipeline
+        self.stable_prefix = stable_prefix
+        # Ollama unloads an idle model after 5 minutes by default; a long plan
+        # (or a slow tool) must not pay the reload on its next turn.
+        self.keep_alive = keep_alive
+        self.plan_workers = max(1, plan_workers)
+        self.tool_output_tokens = tool_output_tokens
+        self.scheduler = ToolScheduler(self._dispatch, max_workers=tool_workers)
+        # Sub-tasks, tool workers and the plan loop all print; lines go out whole.
+        self.console = Console()
+        self.outputs = OutputStore(page_tokens=tool_output_tokens)
+        # Summaries of older results are extractive unless a (small) model is given
+        # for them, either directly or as the router's "summarize" route.
+        if summary_model:
+            summarize = llm_summarizer(summary_model)
+        elif self.router.configured("summarize"):
+            summarize = llm_summarizer(router=self.router)
+        else:
+            summarize = None
+        self.context = ContextBuilder(context_tokens, store=self.outputs, summarize=summarize)
         self.memory = MemoryManager()
-        self.tools = ToolRegistry(memory_manager=self.memory)
-        self.planner = Planner(model_name=self.model)
+        self.tools = ToolRegistry(memory_manager=self.memory, output_store=self.outputs)
+        # Goals that come back reuse the plan that last completed for them.
+        self.planner = Planner(model_name=self.model, keep_alive=self.keep_alive, router=self.router,
+                               cache=PlanCache() if plan_cache else None)
         self.state_file = "qwen/data/state/active_plan.json"
-        os.makedirs("qwen/data/state", exist_ok=True)
+        self.plan_state = PlanState(self.state_file)
         self.system_prompt = self._load_system_prompt()
 
     def _load_system_prompt(self):
@@ -29,82 +65,296 @@ class QwenEngine:
         FORMAT: Output valid JSON tool calls when needed.
         """
 
-    def run(self, initial_prompt=None):
+    def run(self, initial_prompt=None, resume=False):
         print(f"--- Qwen Chained Architect Online ({self.model}) ---")
-        
+        # Load the models while the user types (or the plan is read back).
+        for model in self.router.models_in_use():
+            threading.Thread(target=llm.warm, args=(model, self.keep_alive), daemon=True).start()
+        # Likewise the memory indexes, so the first recall_memory is not spent loading them.
+        if self.tools.recall:
+            self.tools.recall.warm(background=True)
+        if resume:
+            try:
+                self.resume()
+            except KeyboardInterrupt:
+                print("\n[Engine] Interrupted; progress saved. Run with --resume to continue.")
+            self._report()
+            return
+
         while True:
             try:
                 goal = initial_prompt if initial_prompt else input("\nOverall Goal: ")
                 if not goal or goal.lower() in ['exit', 'quit']: break
                 
                 # 1. Decompose Goal
-                plan = self.planner.decompose(goal)
-                self._save_state(goal, plan)
-                print(f"[Engine] Plan generated: {len(plan)} sub-tasks.")
-
-                # 2. Iterate through Sub-tasks
-                results = []
-                for i, sub_task in enumerate(plan):
-                    print(f"\n>>> Executing Sub-Task {i+1}/{len(plan)}: {sub_task}")
-                    
-                    # Construct context for this specific sub-task
-                    history = [
-                        {'role': 'system', 'content': self.system_prompt},
-                        {'role': 'system', 'content': f"OVERALL GOAL: {goal}\nPREVIOUS RESULTS: {json.dumps(results)}"},
-                        {'role': 'user', 'content': f"CURRENT SUB-TASK: {sub_task}"}
-                    ]
-                    
-                    sub_result = self._solve_sub_task(history)
-                    results.append({"task": sub_task, "result": sub_result})
-                    self._update_state(i + 1, sub_result)
+                if self.pipeline:
+                    plan = self.planner.decompose_stream(goal)
+                    self.plan_state.start(goal, [], planned=False)
+                else:
+                    plan = self.planner.decompose(goal)
+                    self._save_state(goal, plan)
+                    print(f"[Engine] Plan generated: {len(plan)} sub-tasks.")
+
+                # 2. Run sub-tasks as their dependencies complete
+                self._run_plan(goal, plan)
+                self._record_outcome()
 
                 print("\n[Engine] Overall Goal Accomplished.")
                 if initial_prompt: break
                 initial_prompt = None
                 
-            except KeyboardInterrupt: break
+            except KeyboardInterrupt:
+                if self.plan_state.state is not None:
+                    print("\n[Engine] Interrupted; progress saved. Run with --resume to continue.")
+                break
+        self._report()
+
+    def _report(self):
+        llm.default_client().report()
+        self.router.report()
+        self.router.export()
+
+    def resume(self):
+        """Continues the plan in active_plan.json, re-running only sub-tasks that never finished."""
+        state = self.plan_state.load()
+        if state is None:
+            print("[Engine] No active plan to resume.")
+            return
+        done = {int(node_id): node["result"] for node_id, node in state["nodes"].items() if node["status"] == "done"}
+        if len(done) == len(state["plan"]):
+            print("[Engine] Active plan is already complete.")
+            return
+        print(f"[Engine] Resuming '{state['goal']}': {len(done)}/{len(state['plan'])} sub-tasks already done.")
+        if not state["planned"]:
+            print("[Engine] Planning was interrupted; only the sub-tasks planned so far will run.")
+        self._run_plan(state["goal"], state["plan"], done)
+        self._record_outcome()
+        print("\n[Engine] Overall Goal Accomplished.")
+
+    def _record_outcome(self):
+        """A plan counts as successful only if it was fully generated and every sub-task is done.
+
+        An incomplete plan (planning failed or was cut short) says nothing
+        about the plan the goal needs, so it is not reported to the cache.
+        """
+        state = self.plan_state.state
+        if not state["planned"]:
+            return
+        success = bool(state["plan"]) and state["planned"] and state["completed"] == len(state["plan"])
+        self.planner.record_outcome(state["goal"], state["plan"], success)
+
+    def _run_plan(self, goal, plan, done=None):
+        """Runs the plan DAG with up to plan_workers sub-tasks in flight.
+
+        A node starts once all of its dependencies are done and sees only the
+        results of its ancestors, so independent branches never wait on (or
+        read) each other. A failed node skips everything downstream of it.
+        Nodes in done (id -> result, from a resumed plan) are not run again.
+
+        plan is either a list or an iterator of nodes still being generated
+        (pipelined planning): nodes are scheduled as they arrive, and the
+        overlap between planning and sub-task work is logged at the end.
+        """
+        nodes, ancestors = {}, {}
+        results = dict(done or {})
+        status = {}
+        running = {}
+        events = queue.Queue()
+        streamed = not isinstance(plan, list)
+        started = time.perf_counter()
+        planned_at = None
+        spans = {}  # node id -> [start, end]
+
+        def add(node):
+            # Dependencies always point at earlier nodes, which are already known.
+            nodes[node['id']] = node
+            ancestors[node['id']] = set(node['depends_on']).union(*(ancestors[d] for d in node['depends_on']))
+            status[node['id']] = "done" if node['id'] in results else "pending"
 
-    def _solve_sub_task(self, history):
+        if streamed:
+            threading.Thread(target=self._feed_plan, args=(plan, events), daemon=True).start()
+        else:
+            for node in plan:
+                add(node)
+
+        pool = ThreadPoolExecutor(max_workers=self.plan_workers)
+        try:
+            while True:
+                for node_id, node in nodes.items():
+                    if status[node_id] != "pending":
+                        continue
+                    deps = [status[d] for d in node['depends_on']]
+                    if any(s in ("failed", "skipped") for s in deps):
+                        status[node_id] = "skipped"
+                        self._update_state(node_id, "skipped")
+                    elif all(s == "done" for s in deps) and len(running) < self.plan_workers:
+                        total = f"{len(nodes)}+" if streamed and planned_at is None else len(nodes)
+                        self.console.line(f"\n>>> Executing Sub-Task {node_id}/{total}: {node['task']}")
+                        context = [{"task": nodes[a]['task'], "result": results[a]} for a in sorted(ancestors[node_id])]
+                        label = f"[Sub-Task {node_id}] " if self.plan_workers > 1 or streamed else ""
+                        self.console.started()
+                        future = pool.submit(self._run_node, goal, node['task'], context, label)
+                        running[future] = node_id
+                        spans[node_id] = [time.perf_counter(), None]
+                        future.add_done_callback(lambda f: (self.console.finished(), events.put(("finished", f))))
+                        status[node_id] = "running"
+                        self._update_state(node_id, "running")
+                if not running and (not streamed or planned_at is not None):
+                    break
+                kind, payload = events.get()
+                if kind == "node":
+                    add(payload)
+                    self.plan_state.add_node(payload)
+                elif kind == "planned":
+                    planned_at = time.perf_counter()
+                    if payload is not None:
+                        # The plan stays unplanned: it is incomplete, so it is
+                        # neither a success nor something to cache.
+                        self.console.line(f"[Engine] Planning failed after {len(nodes)} sub-tasks: {payload}")
+                    else:
+                        self.plan_state.finish_planning()
+                        self.console.line(f"[Engine] Plan generated: {len(nodes)} sub-tasks.")
+                else:
+                    node_id = running.pop(payload)
+                    spans[node_id][1] = time.perf_counter()
+                    try:
+                        results[node_id] = payload.result()
+                        status[node_id] = "done"
+                        self._update_state(node_id, "done", results[node_id])
+                    except Exception as e:
+                        self.console.line(f"[Engine] Sub-Task {node_id} failed: {e}")
+                        status[node_id] = "failed"
+                        self._update_state(node_id, "failed", str(e))
+            if streamed and spans:
+                # Sub-task time spent while the planner was still generating.
+                overlap = sum(max(0.0, min(end, planned_at) - start) for start, end in spans.values())
+                first = min(start for start, _ in spans.values()) - started
+                print(f"[Engine] Pipelined planning: plan took {planned_at - started:.1f}s, first sub-task "
+                      f"started at {first:.1f}s, {overlap:.1f}s of sub-task work overlapped planning.")
+        finally:
+            # On Ctrl-C, do not wait for queued sub-tasks; running ones stay
+            # "running" in the journal and are redone on --resume.
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.plan_state.checkpoint()
+        return results
+
+    @staticmethod
+    def _feed_plan(plan, events):
+        try:
+            for node in plan:
+                events.put(("node", node))
+        except Exception as e:
+            events.put(("planned", e))
+            return
+        events.put(("planned", None))
+
+    def _run_node(self, goal, task, context, label=""):
+        # Built on the worker: summarizing older results may itself call a model.
+        history = self.context.messages(self.system_prompt, goal, task, context, stable=self.stable_prefix)
+        return self._solve_sub_task(history, label)
+
+    def _solve_sub_task(self, history, label=""):
         max_turns = 5 # Small turns for small tasks
         last_out = ""
         for turn in range(max_turns):
-            response = ollama.chat(model=self.model, messages=history, tools=self.tools.get_definitions())
-            msg = response['message']
+            if self.stream:
+                msg, results = self._stream_turn(history, turn + 1, label)
+            else:
+                msg, results = self._blocking_turn(history, label)
             history.append(msg)
-            
-            content = msg.get('content', '')
-            if content: print(f"Qwen: {content}")
-            
-            tool_calls = msg.get('tool_calls') or self._fallback_parse(content)
-            if tool_calls:
-                for tool in tool_calls:
-                    fn_name = tool['function']['name']
-                    args = tool['function']['arguments']
-                    print(f"[*] Tool Call: {fn_name}")
-                    res = self.tools.execute(fn_name, args)
-                    history.append({'role': 'tool', 'content': json.dumps(res)})
+            if results:
+                for res in results:
+                    # Large outputs (e.g. read_file on a big file) go in as head/tail plus a handle.
+                    history.append({'role': 'tool', 'content': json.dumps(shrink(res, self.tool_output_tokens, self.outputs))})
             else:
-                last_out = content
+                last_out = msg.get('content', '')
                 break
         return last_out
 
+    def _dispatch(self, tool):
+        fn_name = tool['function']['name']
+        args = tool['function']['arguments']
+        self.console.line(f"[*] Tool Call: {fn_name}")
+        return self.tools.execute(fn_name, args)
+
+    def _blocking_turn(self, history, label=""):
+        response = self.router.chat("subtask", history, tools=self.tools.get_definitions(), keep_alive=self.keep_alive)
+        msg = response['message']
+        content = msg.get('content', '')
+        if content: self.console.line(f"{label}Qwen: {content}")
+        tool_calls = msg.get('tool_calls') or self._fallback_parse(content)
+        futures = [self.scheduler.submit(tool) for tool in tool_calls or []]
+        return msg, [future.result() for future in futures]
+
+    def _stream_turn(self, history, turn, label=""):
+        """Prints tokens as they arrive and dispatches each tool call as soon as it is complete.
+
+        Native tool_calls take precedence; JSON calls in the content are only
+        used while the model has not produced native ones. Tokens go out live
+        while this is the only sub-task running, and as whole labelled lines
+        otherwise (see Console).
+        """
+        started = time.perf_counter()
+        first_token = first_tool = None
+        content = ""
+        scanner = ToolCallScanner()
+        native_calls = []
+        from_content = []  # keys of calls dispatched from the content
+        pending = []  # (tool, future) in call order
+
+        def key(tool):
+            return json.dumps([tool['function']['name'], tool['function']['arguments']], sort_keys=True, default=str)
+
+        def submit(tool):
+            nonlocal first_tool
+            if first_tool is None:
+                first_tool = time.perf_counter() - started
+            pending.append((tool, self.scheduler.submit(tool)))
+
+        stream = self.router.chat("subtask", history, tools=self.tools.get_definitions(), stream=True,
+                                  keep_alive=self.keep_alive)
+        out = self.console.stream(label)
+        try:
+            for chunk in stream:
+                msg = chunk['message']
+                token = msg.get('content') or ''
+                if token:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    out.write(token)
+                    content += token
+                    if not native_calls:
+                        for call in scanner.feed(token):
+                            from_content.append(key(call))
+                            submit(call)
+                for tool in msg.get('tool_calls') or []:
+                    native_calls.append(tool)
+                    # The same call may already have been dispatched from the content.
+                    if key(tool) in from_content:
+                        from_content.remove(key(tool))
+                        continue
+                    submit(tool)
+        finally:
+            out.close()
+        if not native_calls:
+            # Calls that were inside a candidate the scanner only gives up on at the end.
+            for call in scanner.finish():
+                from_content.append(key(call))
+                submit(call)
+        total = time.perf_counter() - started
+        fmt = lambda t: f"{t * 1000:.0f}ms" if t is not None else "n/a"
+        self.console.line(f"{label}[Metrics] turn {turn}: ttft={fmt(first_token)} first_tool={fmt(first_tool)} total={fmt(total)}")
+
+        assistant = {'role': 'assistant', 'content': content}
+        if native_calls:
+            assistant['tool_calls'] = native_calls
+        return assistant, [future.result() for _, future in pending]
+
     def _save_state(self, goal, plan):
-        state = {"goal": goal, "plan": plan, "completed": 0, "results": []}
-        with open(self.state_file, 'w') as f: json.dump(state, f, indent=2)
+        self.plan_state.start(goal, plan)
 
-    def _update_state(self, index, result):
-        with open(self.state_file, 'r') as f: state = json.load(f)
-        state["completed"] = index
-        state["results"].append(result)
-        with open(self.state_file, 'w') as f: json.dump(state, f, indent=2)
+    def _update_state(self, node_id, status, result=None):
+        self.plan_state.record(node_id, status, result)
 
     def _fallback_parse(self, content):
-        calls = []
-        pattern = r'\{"name":\s*"[^"]+",\s*"arguments":\s*\{.*?\}\}'
-        matches = re.finditer(pattern, content, re.DOTALL)
-        for match in matches:
-            try:
-                data = json.loads(match.group(0))
-                calls.append({'function': data})
-            except: continue
-        return calls if calls else None
+        return parse_tool_calls(content) or None
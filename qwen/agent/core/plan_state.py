@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+
+class PlanState:
+    """Crash-safe record of the active plan.
+
+    active_plan.json is a checkpoint, only ever replaced atomically. Every
+    node status change (and every node that arrives while the plan is still
+    streaming) is appended and fsynced to a journal first, with a sequence
+    number; load() replays journal entries newer than the checkpoint, so at
+    most a torn final line is lost. The journal is folded into the
+    checkpoint every CHECKPOINT_EVERY entries and when a plan ends.
+    """
+
+    CHECKPOINT_EVERY = 10
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.journal_file = os.path.splitext(state_file)[0] + ".journal.jsonl"
+        os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+        self.state = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self, goal, plan, planned=True):
+        """planned=False starts a plan whose nodes are still streaming in (see add_node)."""
+        nodes = {str(node['id']): {"status": "pending", "result": None} for node in plan}
+        self.state = {"goal": goal, "plan": list(plan), "nodes": nodes, "completed": 0, "planned": planned, "seq": 0}
+        with self._lock:
+            self._checkpoint()
+
+    def record(self, node_id, status, result=None):
+        self._append({"id": str(node_id), "status": status, "result": result})
+
+    def add_node(self, node):
+        self._append({"node": node})
+
+    def finish_planning(self):
+        self._append({"planned": True})
+
+    def _append(self, entry):
+        with self._lock:
+            self.state["seq"] += 1
+            entry = dict(entry, seq=self.state["seq"])
+            with open(self.journal_file, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(self.state, entry)
+            self._pending += 1
+            if self._pending >= self.CHECKPOINT_EVERY:
+                self._checkpoint()
+
+    def checkpoint(self):
+        with self._lock:
+            if self.state is not None:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        tmp = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_file)
+        # Entries up to state["seq"] are now in the checkpoint; a crash before
+        # this truncate only leaves entries that load() skips.
+        open(self.journal_file, 'w').close()
+        self._pending = 0
+
+    @staticmethod
+    def _apply(state, entry):
+        if "node" in entry:
+            state["plan"].append(entry["node"])
+            state["nodes"][str(entry["node"]["id"])] = {"status": "pending", "result": None}
+        elif "planned" in entry:
+            state["planned"] = True
+        elif entry["id"] in state["nodes"]:
+            state["nodes"][entry["id"]] = {"status": entry["status"], "result": entry["result"]}
+        state["completed"] = sum(1 for node in state["nodes"].values() if node["status"] == "done")
+
+    def load(self):
+        """Returns the last recorded state (checkpoint plus journal), or None."""
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if "nodes" not in state:  # written before per-node status existed
+            return None
+        state.setdefault("seq", 0)
+        state.setdefault("planned", True)
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r') as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # torn write from a crash
+                    entry = json.loads(line)
+                    if entry["seq"] > state["seq"]:
+                        self._apply(state, entry)
+                        state["seq"] = entry["seq"]
+        self.state = state
+        return state
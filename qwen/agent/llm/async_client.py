@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+from urllib.parse import urlsplit
+
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+
+class OllamaError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class RetryableError(OllamaError):
+    """Connection failures, timeouts and 5xx/429 responses."""
+
+def _plain(obj):
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(exclude_none=True)
+    return str(obj)
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+class AsyncOllamaClient:
+    """asyncio client for Ollama's HTTP API over pooled keep-alive connections.
+
+    Plain HTTP/1.1 on asyncio streams (no third-party dependency). Every
+    request runs under a per-model semaphore, so one busy model cannot take
+    all of Ollama's parallel slots; connection failures, timeouts and 5xx
+    answers are retried with exponential backoff and jitter. Cancelling the
+    calling task closes its connection, which makes Ollama stop generating.
+    """
+
+    def __init__(self, host=None, pool_size=8, timeout=300.0, connect_timeout=5.0,
+                 retries=3, backoff=0.5, model_limits=None, default_limit=4):
+        host = host or OLLAMA_HOST
+        url = urlsplit(host if '://' in host else f"http://{host}")
+        self.host = url.hostname or 'localhost'
+        self.port = url.port or 11434
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.model_limits = dict(model_limits or {})
+        self.default_limit = default_limit
+        self.pool_size = pool_size
+        self._idle = []
+        self._slots = None
+        self._limiters = {}
+        self.counters = {"requests": 0, "retries": 0, "connections": 0, "reused": 0}
+
+    def limiter(self, model):
+        if model not in self._limiters:
+            self._limiters[model] = asyncio.Semaphore(self.model_limits.get(model, self.default_limit))
+        return self._limiters[model]
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        await self._slots.acquire()
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.reader.at_eof():
+                self.counters["reused"] += 1
+                return conn
+            conn.close()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+        except BaseException:
+            self._slots.release()
+            raise
+        self.counters["connections"] += 1
+        return _Connection(reader, writer)
+
+    def _release(self, conn, reusable):
+        if reusable:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    async def _read(self, coro):
+        return await asyncio.wait_for(coro, self.timeout)
+
+    async def _send(self, conn, path, payload):
+        body = json.dumps(payload, default=_plain).encode()
+        head = (f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n").encode()
+        conn.writer.write(head + body)
+        await conn.writer.drain()
+        status_line = await self._read(conn.reader.readline())
+        if not status_line:
+            raise RetryableError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._read(conn.reader.readline())
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    def _reusable(headers):
+        """Whether the connection can carry another request once this body is read."""
+        if headers.get('connection', '').lower() == 'close':
+            return False
+        return 'content-length' in headers or headers.get('transfer-encoding', '').lower() == 'chunked'
+
+    async def _body(self, conn, headers):
+        """Yields the response body in pieces (chunked, sized or until EOF)."""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self._read(conn.reader.readline())).split(b";")[0], 16)
+                if size == 0:
+                    await self._read(conn.reader.readline())
+                    return
+                data = await self._read(conn.reader.readexactly(size))
+                await self._read(conn.reader.readexactly(2))
+                yield data
+        elif 'content-length' in headers:
+            yield await self._read(conn.reader.readexactly(int(headers['content-length'])))
+        else:
+            yield await self._read(conn.reader.read())
+
+    def _check(self, status, data):
+        if status < 400:
+            return
+        try:
+            message = json.loads(data).get('error', '')
+        except ValueError:
+            message = data[:200].decode('utf-8', 'replace')
+        error = RetryableError if status >= 500 or status == 429 else OllamaError
+        raise error(f"Ollama returned {status}: {message}", status)
+
+    async def _delay(self, attempt):
+        self.counters["retries"] += 1
+        await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    async def post(self, path, payload, model=None):
+        """One JSON request/response, retried on transient failures."""
+        async with self.limiter(model or payload.get('model')):
+            for attempt in range(self.retries + 1):
+                self.counters["requests"] += 1
+                conn, reusable = await self._acquire(), False
+                try:
+                    status, headers = await self._send(conn, path, payload)
+                    data = b"".join([piece async for piece in self._body(conn, headers)])
+                    reusable = self._reusable(headers)
+                    self._check(status, data)
+                    return json.loads(data)
+                except (RetryableError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    reusable = False
+                    if attempt == self.retries:
+                        raise RetryableError(f"{path} failed after {attempt + 1} attempts: {type(e).__name__}: {e}") from e
+                finally:
+                    self._release(conn, reusable)
+                await self._delay(attempt)
+
+    async def stream(self, path, payload, model=None):
+        """Yields NDJSON objects as they arrive; only retried before the first one."""
+        async with self.limiter(model or payload.get('model')):
+            for attempt in range(self.retries + 1):
+                self.counters["requests"] += 1
+                conn, reusable, started = await self._acquire(), False, False
+                try:
+                    status, headers = await self._send(conn, path, payload)
+                    if status >= 400:
+                        data = b"".join([piece async for piece in self._body(conn, headers)])
+                        self._check(status, data)
+                    buffer = b""
+                    async for piece in self._body(conn, headers):
+                        buffer += piece
+                        *lines, buffer = buffer.split(b"\n")
+                        for line in lines:
+                            if line.strip():
+                                item = json.loads(line)
+                                if 'error' in item:
+                                    raise OllamaError(item['error'])
+                                started = True
+                                yield item
+                    if buffer.strip():
+                        yield json.loads(buffer)
+                    reusable = self._reusable(headers)
+                    return
+                except (RetryableError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    if started or attempt == self.retries:
+                        raise RetryableError(f"{path} stream failed: {type(e).__name__}: {e}") from e
+                finally:
+                    # Also runs on cancellation or an abandoned generator:
+                    # closing the socket tells Ollama to stop generating.
+                    self._release(conn, reusable)
+                await self._delay(attempt)
+
+    def _payload(self, model, messages, tools, stream, options):
+        payload = {"model": model, "messages": messages, "stream": stream}
+        if tools:
+            payload["tools"] = tools
+        payload.update({k: v for k, v in options.items() if v is not None})
+        return payload
+
+    async def chat(self, model, messages, tools=None, **options):
+        return await self.post("/api/chat", self._payload(model, messages, tools, False, options))
+
+    def chat_stream(self, model, messages, tools=None, **options):
+        return self.stream("/api/chat", self._payload(model, messages, tools, True, options))
+
+    async def embed(self, model, texts, **options):
+        payload = {"model": model, "input": list(texts)}
+        payload.update({k: v for k, v in options.items() if v is not None})
+        return await self.post("/api/embed", payload)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+class LoopThread:
+    """One event loop on a daemon thread, running an AsyncOllamaClient for synchronous callers.
+
+    Threads (plan workers, tool workers) block on their own request while the
+    loop multiplexes all of them over the shared connection pool.
+    """
+
+    _DONE = object()
+
+    def __init__(self, client=None):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="ollama-loop", daemon=True)
+        self.thread.start()
+        self.client = client or AsyncOllamaClient()
+
+    def run(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()  # e.g. Ctrl-C in the caller: abort the request too
+            raise
+
+    def iterate(self, agen):
+        """Synchronous iterator over an async generator; closing it early cancels the request."""
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+                items.put(self._DONE)
+            except BaseException as e:
+                items.put(e)
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item = items.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def chat(self, model, messages, tools=None, stream=False, **options):
+        if stream:
+            return self.iterate(self.client.chat_stream(model, messages, tools, **options))
+        return self.run(self.client.chat(model, messages, tools, **options))
+
+    def embed(self, model, texts, **options):
+        return self.run(self.client.embed(model, texts, **options))
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .async_client import LoopThread
+
+CACHE_FILE = "qwen/data/cache/ollama_chat.sqlite"
+
+# off (default): always call Ollama; on: serve hits, store misses; replay:
+# never call Ollama (a miss raises CacheMiss), for deterministic test runs.
+# Off by default so a retried goal gets a fresh plan and fresh answers.
+MODES = ("off", "on", "replay")
+
+class CacheMiss(LookupError):
+    pass
+
+def _plain(obj):
+    """JSON fallback for ollama's pydantic messages and tool calls."""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(exclude_none=True)
+    return str(obj)
+
+def _canonical(value):
+    # Round-trip through JSON so pydantic objects and dicts hash the same way.
+    return json.loads(json.dumps(value, default=_plain))
+
+def request_key(model, messages, tools=None, **options):
+    options.pop('keep_alive', None)  # affects how long the model stays loaded, not the answer
+    payload = {"model": model, "messages": messages, "tools": tools or [], "options": options}
+    blob = json.dumps(_canonical(payload), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class ChatCache:
+    """Content-addressed SQLite store of chat responses with LRU eviction by count and size."""
+
+    def __init__(self, path=CACHE_FILE, max_entries=5000, max_bytes=256 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER,
+            elapsed_ms REAL, created REAL, last_used REAL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+
+    def get(self, key):
+        """Returns (response, elapsed_ms of the original call) or None."""
+        with self.lock:
+            row = self.db.execute("SELECT response, elapsed_ms FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, model, response, elapsed_ms):
+        blob = json.dumps(_canonical(response))
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (key, model, blob, len(blob), elapsed_ms, now, now))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # Walk least recently used entries until both limits hold again.
+        doomed = []
+        for key, entry_size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def default_transport():
+    """Process-wide event loop and connection pool shared by every synchronous caller."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = LoopThread()
+        return _loop
+
+class LLMClient:
+    """Drop-in for ollama.chat with an opt-in shared on-disk response cache.
+
+    With QWEN_LLM_CACHE=on (or replay), identical requests (same model,
+    messages, tools and options) are served from the cache. Streaming hits
+    replay the stored message as one chunk; streaming misses are stored once
+    the stream has been read to the end. Misses go to Ollama through the
+    pooled asyncio transport.
+    """
+
+    def __init__(self, cache=None, mode=None, transport=None):
+        self.transport = transport or default_transport()
+        self.mode = mode or os.environ.get("QWEN_LLM_CACHE", "off")
+        if self.mode not in MODES:
+            raise ValueError(f"QWEN_LLM_CACHE must be one of {MODES}, got {self.mode!r}")
+        self.cache = cache if cache is not None or self.mode == "off" else ChatCache()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "saved_ms": 0.0, "spent_ms": 0.0}
+
+    def _count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def chat(self, model, messages, tools=None, stream=False, **options):
+        if self.mode == "off":
+            return self.transport.chat(model, messages, tools, stream=stream, **options)
+
+        key = request_key(model, messages, tools, **options)
+        hit = self.cache.get(key)
+        if hit is not None:
+            response, elapsed_ms = hit
+            self._count(hits=1, saved_ms=elapsed_ms)
+            return iter([dict(response, done=True)]) if stream else response
+        if self.mode == "replay":
+            raise CacheMiss(f"no cached response for {model} request {key[:12]}")
+
+        self._count(misses=1)
+        started = time.perf_counter()
+        if not stream:
+            response = self.transport.chat(model, messages, tools, **options)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._count(spent_ms=elapsed_ms)
+            self.cache.put(key, model, {"model": model, "message": response['message']}, elapsed_ms)
+            return response
+        return self._record_stream(key, model, started,
+                                   self.transport.chat(model, messages, tools, stream=True, **options))
+
+    def _record_stream(self, key, model, started, stream):
+        content = ""
+        tool_calls = []
+        for chunk in stream:
+            msg = chunk['message']
+            content += msg.get('content') or ''
+            tool_calls.extend(msg.get('tool_calls') or [])
+            yield chunk
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._count(spent_ms=elapsed_ms)
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self.cache.put(key, model, {"model": model, "message": message}, elapsed_ms)
+
+    def stats(self):
+        calls = self.counters["hits"] + self.counters["misses"]
+        rate = self.counters["hits"] / calls if calls else 0.0
+        return dict(self.counters, saved_ms=round(self.counters["saved_ms"], 1),
+                    spent_ms=round(self.counters["spent_ms"], 1), hit_rate=round(rate, 3))
+
+    def report(self):
+        stats = self.stats()
+        if stats["hits"] + stats["misses"]:
+            print(f"[LLM Cache] {stats['hits']} hits / {stats['misses']} misses "
+                  f"(hit rate {stats['hit_rate']:.0%}), saved {stats['saved_ms'] / 1000:.1f}s")
+
+def warm(model, keep_alive="30m"):
+    """Loads model into Ollama (an empty chat) and keeps it resident for keep_alive."""
+    try:
+        default_transport().chat(model, [], keep_alive=keep_alive)
+        return True
+    except Exception:
+        return False
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_client():
+    """Process-wide client, so every caller shares one cache connection and one set of counters."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = LLMClient()
+        return _default
+
+def chat(model, messages, tools=None, stream=False, **options):
+    return default_client().chat(model, messages, tools=tools, stream=stream, **options)
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from . import client as llm
+from .async_client import OllamaError
+
+ROUTES_FILE = "qwen/data/models.json"
+STATS_FILE = "qwen/data/state/routing.json"
+
+KINDS = ("plan", "subtask", "verify", "summarize")
+
+class ModelRouter:
+    """Sends each request kind to its configured model.
+
+    The config (qwen/data/models.json) maps kinds to models under "routes";
+    a kind that is not listed there goes to default_model (the engine's
+    --model), and the shipped config lists none. "models" describes each
+    model: relative cost, expected p50 latency, max_concurrency and an
+    optional smaller fallback. A request waits for a slot on its model; when
+    fallback_queue_depth or more requests are already queued or running
+    there, it goes to the fallback instead if that is expected to finish
+    sooner. Expected latency uses measured p50s once a model has answered,
+    the table until then.
+    """
+
+    DEFAULT_MODEL = {"cost": 1.0, "p50_ms": 5000, "max_concurrency": 4, "fallback": None}
+
+    def __init__(self, default_model="qwen2.5-coder:7b", path=ROUTES_FILE, config=None):
+        if config is None and path and os.path.exists(path):
+            with open(path, 'r') as f:
+                config = json.load(f)
+        config = config or {}
+        self.default_model = default_model
+        self.routes = {kind: config.get("routes", {}).get(kind, default_model) for kind in KINDS}
+        self._configured = set(config.get("routes", {}))
+        self.models = {name: dict(self.DEFAULT_MODEL, **spec) for name, spec in config.get("models", {}).items()}
+        self.fallback_queue_depth = config.get("fallback_queue_depth", 2)
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.queued = Counter()  # waiting or running, per model
+        self.latencies = {}
+        self.decisions = Counter()
+        self.recent = deque(maxlen=500)
+        self.cost = Counter()
+        self.missing = set()  # fallbacks Ollama does not have
+
+    def spec(self, model):
+        return self.models.get(model, self.DEFAULT_MODEL)
+
+    def _slot(self, model):
+        if model not in self.slots:
+            self.slots[model] = threading.BoundedSemaphore(self.spec(model)["max_concurrency"])
+        return self.slots[model]
+
+    def _p50(self, model):
+        samples = self.latencies.get(model)
+        if samples:
+            return sorted(samples)[len(samples) // 2]
+        return self.spec(model)["p50_ms"]
+
+    def _expected_ms(self, model):
+        # Requests ahead of us drain max_concurrency at a time.
+        waves = self.queued[model] // self.spec(model)["max_concurrency"] + 1
+        return waves * self._p50(model)
+
+    def configured(self, kind):
+        """Whether kind has its own route (rather than the default model)."""
+        return kind in self._configured
+
+    def route(self, kind):
+        """Picks the model for one request of this kind and counts it as queued there."""
+        primary = self.routes.get(kind, self.default_model)
+        fallback = self.spec(primary).get("fallback")
+        with self.lock:
+            model, reason = primary, "route"
+            if fallback and fallback not in self.missing and self.queued[primary] >= self.fallback_queue_depth:
+                if self._expected_ms(fallback) < self._expected_ms(primary):
+                    model, reason = fallback, f"queue depth {self.queued[primary]} on {primary}"
+            self.queued[model] += 1
+            self.decisions[(kind, model)] += 1
+            self.recent.append({"time": round(time.time(), 3), "kind": kind, "model": model, "reason": reason})
+        return model
+
+    def _done(self, model, elapsed_ms):
+        with self.lock:
+            self.queued[model] -= 1
+            self.latencies.setdefault(model, deque(maxlen=1000)).append(elapsed_ms)
+            self.cost[model] += self.spec(model)["cost"]
+
+    def _fallback_missing(self, kind, model, error):
+        """A fallback that is not pulled answers 404: stop using it and retry on the route's own model."""
+        primary = self.routes.get(kind, self.default_model)
+        if model == primary or getattr(error, 'status', None) != 404:
+            return False
+        with self.lock:
+            self.missing.add(model)
+        print(f"[Router] Fallback {model} is not available; using {primary}.\n", end="")  # one write: may run on any thread
+        return True
+
+    def chat(self, kind, messages, tools=None, stream=False, **options):
+        """llm.chat for a request kind: routed, capped per model, and timed."""
+        if stream:
+            return self._stream(kind, messages, tools, options)
+        model = self.route(kind)
+        slot = self._slot(model)
+        slot.acquire()
+        started = time.perf_counter()
+        try:
+            return llm.chat(model, messages, tools=tools, **options)
+        except OllamaError as e:
+            if not self._fallback_missing(kind, model, e):
+                raise
+        finally:
+            slot.release()
+            self._done(model, (time.perf_counter() - started) * 1000)
+        return self.chat(kind, messages, tools, **options)
+
+    def _stream(self, kind, messages, tools, options):
+        model = self.route(kind)
+        slot = self._slot(model)
+        slot.acquire()
+        started = time.perf_counter()
+        yielded = retry = False
+        try:
+            for chunk in llm.chat(model, messages, tools=tools, stream=True, **options):
+                yielded = True
+                yield chunk
+        except OllamaError as e:
+            # Errors such as a missing model surface before the first chunk.
+            if yielded or not self._fallback_missing(kind, model, e):
+                raise
+            retry = True
+        finally:
+            slot.release()
+            self._done(model, (time.perf_counter() - started) * 1000)
+        if retry:
+            yield from self._stream(kind, messages, tools, options)
+
+    def models_in_use(self):
+        return sorted(set(self.routes.values()))
+
+    def stats(self):
+        with self.lock:
+            models = {}
+            for model, samples in self.latencies.items():
+                ordered = sorted(samples)
+                models[model] = {
+                    "calls": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2], 1),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                    "max_ms": round(ordered[-1], 1),
+                    "cost": round(self.cost[model], 2),
+                }
+            decisions = [{"kind": kind, "model": model, "count": count} for (kind, model), count in sorted(self.decisions.items())]
+            return {"routes": dict(self.routes), "models": models, "decisions": decisions}
+
+    def export(self, path=STATS_FILE):
+        """Writes stats plus the most recent routing decisions, for tuning the table."""
+        data = dict(self.stats(), recent=list(self.recent), exported_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+        return data
+
+    def report(self):
+        for model, s in self.stats()["models"].items():
+            print(f"[Router] {model}: {s['calls']} calls, p50 {s['p50_ms'] / 1000:.1f}s, p95 {s['p95_ms'] / 1000:.1f}s")
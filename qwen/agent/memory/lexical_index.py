@@ -0,0 +1,93 @@
+import heapq
+import math
+import os
+import pickle
+from collections import Counter
+
+from .tokenize import tokenize
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our she
+so that the their them then there these they this to was we were what when where which who will with you your
+""".split())
+
+class BM25Index:
+    """Inverted index with BM25 scoring, maintained one document at a time.
+
+    postings maps term -> {doc_id: term frequency}; tags maps tag -> set of
+    doc ids for filtering. The whole index pickles to a single snapshot file.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_len = {}
+        self.tags = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_len
+
+    @staticmethod
+    def terms(text):
+        return [t for t in tokenize(text) if t not in STOPWORDS]
+
+    def add(self, doc_id, text, tags=()):
+        if doc_id in self.doc_len:
+            return
+        terms = self.terms(text)
+        for term, tf in Counter(terms).items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(doc_id)
+        self.doc_len[doc_id] = len(terms)
+        self.total_len += len(terms)
+
+    def search(self, query, k=3, tags=None):
+        """Returns [(doc_id, score)] of the k best BM25 matches, best first."""
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        allowed = None
+        if tags:
+            allowed = set.intersection(*(self.tags.get(tag, set()) for tag in tags))
+            if not allowed:
+                return []
+
+        avgdl = self.total_len / n or 1.0
+        k1, b = self.k1, self.b
+        doc_len = self.doc_len
+        scores = {}
+        for term in set(self.terms(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            if allowed is not None and len(allowed) < df:
+                items = ((d, posting[d]) for d in allowed if d in posting)
+            else:
+                items = posting.items() if allowed is None else ((d, tf) for d, tf in posting.items() if d in allowed)
+            for doc_id, tf in items:
+                norm = k1 * (1 - b + b * doc_len[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'rb') as f:
+                index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return cls()
+        return index if isinstance(index, cls) else cls()
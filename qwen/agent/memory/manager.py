@@ -1,13 +1,61 @@
+import fcntl
 import json
 import os
+import threading
 import time
+from contextlib import contextmanager
+
+from .lexical_index import BM25Index
+
+try:
+    from .vector_store import VectorStore
+except ImportError:  # NumPy not installed: fall back to keyword matching
+    VectorStore = None
 
 class MemoryManager:
-    def __init__(self, data_dir="qwen/data/memories"):
+    """Long-term memory: index.json snapshot + append-only log.jsonl.
+
+    save() appends one line under a file lock and allocates ids from a shared
+    counter, so several processes can share the directory. The log is folded
+    into the snapshot every COMPACT_EVERY entries. Memories are loaded lazily
+    and refreshed incrementally from the log; each one is added to a BM25
+    index that is snapshotted to bm25.pickle alongside the memory snapshot.
+    """
+
+    COMPACT_EVERY = 1000
+
+    def __init__(self, data_dir="qwen/data/memories", embedder=None):
         self.data_dir = data_dir
         os.makedirs(self.data_dir, exist_ok=True)
         self.index_file = os.path.join(self.data_dir, "index.json")
-        self.memories = self._load_index()
+        self.log_file = os.path.join(self.data_dir, "log.jsonl")
+        self.seq_file = os.path.join(self.data_dir, "id.seq")
+        self.lock_file = os.path.join(self.data_dir, ".lock")
+        self.lexical_file = os.path.join(self.data_dir, "bm25.pickle")
+        self.lexical = None
+        self._lexical_unsaved = 0
+        self.vectors = VectorStore(os.path.join(self.data_dir, "vectors"), embedder) if VectorStore else None
+        self._memories = None
+        self.by_id = {}
+        self._log_offset = 0
+        self._snapshot = None
+        self._vectors_synced = False
+        # Recall backends query from several threads at once.
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @property
+    def memories(self):
+        self._refresh()
+        return self._memories
 
     def _load_index(self):
         if os.path.exists(self.index_file):
@@ -15,28 +63,142 @@ class MemoryManager:
                 return json.load(f)
         return []
 
-    def _save_index(self):
-        with open(self.index_file, 'w') as f:
-            json.dump(self.memories, f, indent=2)
+    def _add_loaded(self, entry):
+        # A reader racing a compaction can see an entry in both files.
+        if entry['id'] not in self.by_id:
+            self.by_id[entry['id']] = entry
+            self._memories.append(entry)
+            if entry['id'] not in self.lexical:
+                self.lexical.add(entry['id'], entry['content'], entry.get('tags', []))
+                self._lexical_unsaved += 1
+
+    def _snapshot_key(self):
+        try:
+            st = os.stat(self.index_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def _refresh(self):
+        """Loads the snapshot on first use, then only log lines appended since the last call."""
+        with self._thread_lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        snapshot = self._snapshot_key()
+        if self._memories is None or snapshot != self._snapshot:
+            # First load, or the log was compacted (by us or another process).
+            self._memories, self.by_id, self._log_offset = [], {}, 0
+            self._snapshot = snapshot
+            self.lexical = BM25Index.load(self.lexical_file)
+            self._lexical_unsaved = 0
+            for entry in self._load_index():
+                self._add_loaded(entry)
+            if self._lexical_unsaved > self.COMPACT_EVERY:
+                # Large backfill (first run or stale snapshot): persist it now.
+                self.lexical.save(self.lexical_file)
+                self._lexical_unsaved = 0
+        log_size = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        if log_size <= self._log_offset:
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written by another process; read it next time.
+                self._log_offset += len(line)
+                self._add_loaded(json.loads(line))
+
+    def _next_id(self):
+        """Allocates a monotonic id; caller must hold the lock."""
+        if os.path.exists(self.seq_file):
+            with open(self.seq_file, 'r') as f:
+                last = int(f.read().strip() or 0)
+        else:
+            last = max((m['id'] for m in self.memories), default=0)
+        memory_id = last + 1
+        tmp = f"{self.seq_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(str(memory_id))
+        os.replace(tmp, self.seq_file)
+        return memory_id
+
+    def _compact(self):
+        """Folds the log into the snapshot; caller must hold the lock."""
+        self._refresh()
+        tmp = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._memories, f, indent=2)
+        os.replace(tmp, self.index_file)
+        open(self.log_file, 'w').close()
+        self.lexical.save(self.lexical_file)
+        self._lexical_unsaved = 0
+        self._snapshot, self._log_offset = self._snapshot_key(), 0
+
+    def _sync_vectors(self):
+        """Embeds memories that are not in the vector store yet (new store or older index)."""
+        if self.vectors is None or self._vectors_synced:
+            return
+        with self._thread_lock:
+            self._sync_vectors_locked()
+
+    def _sync_vectors_locked(self):
+        if self._vectors_synced:
+            return
+        indexed = set(int(i) for i in self.vectors.ids())
+        missing = [mem for mem in self.memories if mem['id'] not in indexed]
+        for start in range(0, len(missing), 1024):
+            batch = missing[start:start + 1024]
+            self.vectors.add([mem['id'] for mem in batch], [mem['content'] for mem in batch])
+        self._vectors_synced = True
 
     def save(self, content, tags=None):
         timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        memory_id = len(self.memories) + 1
-        entry = {
-            "id": memory_id,
-            "timestamp": timestamp,
-            "content": content,
-            "tags": tags or []
-        }
-        self.memories.append(entry)
-        self._save_index()
+        with self._locked():
+            memory_id = self._next_id()
+            entry = {
+                "id": memory_id,
+                "timestamp": timestamp,
+                "content": content,
+                "tags": tags or []
+            }
+            with open(self.log_file, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+            if memory_id % self.COMPACT_EVERY == 0:
+                self._compact()
+        if self._memories is not None:
+            self._refresh()
+        if self.vectors is not None:
+            self.vectors.add([memory_id], [content])
         return f"Memory saved with ID {memory_id}"
 
-    def retrieve_relevant(self, query):
-        # Simple keyword matching for now
-        results = []
-        words = query.lower().split()
-        for mem in self.memories:
-            if any(w in mem['content'].lower() for w in words):
-                results.append(mem['content'])
-        return "\n".join(results[-3:]) # Return top 3 recent relevant
+    def search_lexical(self, query, k=3, tags=None):
+        """BM25-ranked (memory, score) pairs, optionally restricted to memories carrying all tags."""
+        with self._thread_lock:
+            self._refresh_locked()
+            return [(self.by_id[i], score) for i, score in self.lexical.search(query, k, tags)]
+
+    def search_vectors(self, query, k=3, tags=None):
+        """Embedding-similarity (memory, score) pairs above the embedder's noise floor; empty without NumPy."""
+        if self.vectors is None:
+            return []
+        self._sync_vectors()
+        self._refresh()
+        floor = getattr(self.vectors.embedder, 'min_score', 0.0)
+        # Over-fetch when filtering so tag misses do not starve the result.
+        hits = self.vectors.search(query, k * 4 if tags else k)
+        results = [(self.by_id[i], score) for i, score in hits if score > floor and i in self.by_id]
+        if tags:
+            results = [(m, s) for m, s in results if set(tags) <= set(m.get('tags', []))]
+        return results[:k]
+
+    def search(self, query, k=3, tags=None):
+        """Returns up to k (memory, score) pairs: BM25 hits first, topped up by vector similarity."""
+        results = self.search_lexical(query, k, tags)
+        if len(results) < k:
+            seen = {m['id'] for m, _ in results}
+            results += [(m, s) for m, s in self.search_vectors(query, k, tags) if m['id'] not in seen][:k - len(results)]
+        return results
+
+    def retrieve_relevant(self, query, k=3, tags=None):
+        return "\n".join(mem['content'] for mem, _ in self.search(query, k, tags))
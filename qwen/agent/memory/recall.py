@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+MEMORY_NETWORK_FILE = os.path.join(REPO_ROOT, 'personality', 'memory_network.json')
+
+RRF_K = 60
+
+class RecallService:
+    """Hybrid recall shared by the personality engine and the Qwen agent.
+
+    A backend is a callable (query, k, tags) -> [(key, text)] in rank order.
+    search() runs every backend concurrently, drops any that miss their
+    latency budget, and fuses the rest with reciprocal-rank fusion. Backends
+    run on daemon threads, so one that overran its budget never holds up
+    interpreter exit; it is skipped as "busy" until that call returns.
+    """
+
+    def __init__(self, backends, budget_ms=250):
+        self.backends = dict(backends)
+        self.budget_ms = dict(budget_ms) if isinstance(budget_ms, dict) else {name: budget_ms for name in self.backends}
+        self.last_timings = {}
+        # Recent latencies only: the daemon lives for days.
+        self.history = {name: deque(maxlen=1000) for name in self.backends}
+        self._overrun = {}  # backend name -> call that missed its budget
+        self._warming = None  # background warm() that searches wait for
+
+    def _timed(self, name, query, k, tags):
+        started = time.perf_counter()
+        hits = self.backends[name](query, k, tags)
+        return hits, (time.perf_counter() - started) * 1000
+
+    def _submit(self, name, query, k, tags):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._timed(name, query, k, tags))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f"recall-{name}", daemon=True).start()
+        return future
+
+    def warm(self, background=False):
+        """Runs each backend once, untimed, so index loading never counts against a budget.
+
+        With background=True it returns at once; a search() issued before the
+        warm-up finishes waits for it before any budget starts.
+        """
+        def run():
+            for backend in self.backends.values():
+                try:
+                    backend("warm up", 1, None)
+                except Exception:
+                    pass
+
+        if not background:
+            run()
+            return
+        self._warming = threading.Thread(target=run, name="recall-warm", daemon=True)
+        self._warming.start()
+
+    def search(self, query, k=5, tags=None):
+        """Returns [(text, fused score, [backend names])], best first."""
+        if self._warming is not None:
+            self._warming.join()
+        timings = {}
+        futures = {}
+        for name in self.backends:
+            if name in self._overrun and not self._overrun[name].done():
+                timings[name] = "busy"
+            else:
+                futures[self._submit(name, query, k, tags)] = name
+        started = time.perf_counter()
+        ranked = {}
+        # Each backend gets its own budget, measured from submission.
+        for future, name in sorted(futures.items(), key=lambda item: self.budget_ms.get(item[1], 0)):
+            remaining = self.budget_ms.get(name, 0) / 1000 - (time.perf_counter() - started)
+            wait([future], timeout=max(0.0, remaining))
+            if not future.done():
+                timings[name] = "timeout"
+                self._overrun[name] = future
+                continue
+            try:
+                hits, elapsed = future.result()
+            except Exception as e:
+                timings[name] = f"error: {e}"
+                continue
+            timings[name] = round(elapsed, 3)
+            self.history[name].append(elapsed)
+            ranked[name] = hits
+
+        fused = {}
+        for name, hits in ranked.items():
+            for rank, (key, text) in enumerate(hits):
+                entry = fused.setdefault(key, [text, 0.0, []])
+                entry[1] += 1.0 / (RRF_K + rank + 1)
+                entry[2].append(name)
+
+        self.last_timings = timings
+        results = sorted(fused.values(), key=lambda e: e[1], reverse=True)[:k]
+        return [(text, score, sources) for text, score, sources in results]
+
+    def stats(self):
+        """Per-backend latency summary in milliseconds."""
+        summary = {}
+        for name, samples in self.history.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            summary[name] = {
+                "calls": len(ordered),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max": round(ordered[-1], 3),
+            }
+        return summary
+
+def memory_backends(memory_manager):
+    def lexical(query, k, tags):
+        return [(f"memory:{m['id']}", m['content']) for m, _ in memory_manager.search_lexical(query, k, tags)]
+
+    def vector(query, k, tags):
+        return [(f"memory:{m['id']}", m['content']) for m, _ in memory_manager.search_vectors(query, k, tags)]
+
+    return {"lexical": lexical, "vector": vector}
+
+def graph_backend(load_graph=None):
+    """Backend over the personality memory graph; tag-filtered queries skip it."""
+    if load_graph is None:
+        scripts_dir = os.path.join(REPO_ROOT, 'personality', 'scripts')
+        if scripts_dir not in sys.path:
+            sys.path.insert(0, scripts_dir)
+        from memory_graph import MemoryGraph
+        cached = {}
+
+        def load_graph():
+            try:
+                mtime = os.stat(MEMORY_NETWORK_FILE).st_mtime_ns
+            except OSError:
+                mtime = None
+            if cached.get('mtime') != mtime or 'graph' not in cached:
+                cached['graph'], cached['mtime'] = MemoryGraph.load(MEMORY_NETWORK_FILE), mtime
+            return cached['graph']
+
+    def graph(query, k, tags):
+        if tags:
+            return []
+        return [(f"graph:{line}", line) for line in load_graph().query(query)[:k]]
+
+    return graph
+
+def default_service(memory_manager, load_graph=None, budget_ms=250):
+    backends = memory_backends(memory_manager)
+    backends["graph"] = graph_backend(load_graph)
+    return RecallService(backends, budget_ms)
@@ -0,0 +1,7 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+def tokenize(text):
+    """Lowercased alphanumeric word tokens."""
+    return TOKEN_RE.findall(text.lower())
@@ -0,0 +1,185 @@
+import fcntl
+import json
+import math
+import os
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from .tokenize import tokenize
+
+
+class HashingEmbedder:
+    """Local embedder: signed feature hashing of words and word bigrams, L2-normalised."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        # Unrelated texts still share buckets by chance; their cosine has a
+        # standard deviation of about 1/sqrt(dim), so scores under three of
+        # those are treated as noise.
+        self.min_score = 3 / math.sqrt(dim)
+
+    def _features(self, text):
+        words = tokenize(text)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                counts[h] = counts.get(h, 0) + 1
+            for h, tf in counts.items():
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                out[row, h % self.dim] += sign * (1.0 + math.log(tf))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama embedding model (e.g. nomic-embed-text).
+
+    Requests go through the agent's pooled Ollama transport. dim must match
+    the model's output size; it is recorded in the store's metadata.
+    """
+
+    def __init__(self, model="nomic-embed-text", dim=768, keep_alive="30m"):
+        self.model = model
+        self.dim = dim
+        self.keep_alive = keep_alive
+        self.name = f"ollama-{model}"
+
+    def embed(self, texts):
+        from ..llm.client import default_transport
+        response = default_transport().embed(self.model, texts, keep_alive=self.keep_alive)
+        vectors = np.asarray(response['embeddings'], dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def default_embedder():
+    """Embedder selected by QWEN_EMBEDDER: "hashing" (default), "ollama" or "ollama:<model>[:<dim>]"."""
+    spec = os.environ.get("QWEN_EMBEDDER", "hashing")
+    kind, _, rest = spec.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder(int(rest)) if rest else HashingEmbedder()
+    if kind == "ollama":
+        model, _, dim = rest.partition(":")
+        return OllamaEmbedder(model or "nomic-embed-text", int(dim) if dim else 768)
+    raise ValueError(f"QWEN_EMBEDDER must be hashing[:<dim>] or ollama[:<model>[:<dim>]], got {spec!r}")
+
+
+class VectorStore:
+    """Append-only float32 matrix on disk, memory-mapped for search.
+
+    vectors.f32 holds one normalised row per memory, vectors.ids the matching
+    int64 memory ids; appends extend both files without rebuilding anything.
+    """
+
+    BLOCK_ROWS = 65536
+
+    def __init__(self, data_dir, embedder=None):
+        self.data_dir = data_dir
+        self.embedder = embedder or default_embedder()
+        self.dim = self.embedder.dim
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.vectors_file = os.path.join(self.data_dir, "vectors.f32")
+        self.ids_file = os.path.join(self.data_dir, "vectors.ids")
+        self.meta_file = os.path.join(self.data_dir, "vectors.json")
+        self._check_meta()
+        self._matrix = None
+        self._ids = None
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.data_dir, ".lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _check_meta(self):
+        meta = {"embedder": self.embedder.name, "dim": self.dim}
+        with self._locked():
+            stored = None
+            if os.path.exists(self.meta_file):
+                with open(self.meta_file, 'r') as f:
+                    stored = json.load(f)
+            if stored == meta:
+                return
+            # Vectors from another embedder are not comparable; start over.
+            for path in (self.vectors_file, self.ids_file):
+                if os.path.exists(path): os.remove(path)
+            with open(self.meta_file, 'w') as f:
+                json.dump(meta, f)
+
+    def __len__(self):
+        if not os.path.exists(self.ids_file):
+            return 0
+        return os.path.getsize(self.ids_file) // 8
+
+    def ids(self):
+        self._map()
+        return self._ids
+
+    def _map(self):
+        n = len(self)
+        if self._ids is not None and len(self._ids) == n:
+            return
+        if n == 0:
+            self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            return
+        self._matrix = np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(n, self.dim))
+        self._ids = np.memmap(self.ids_file, dtype=np.int64, mode='r', shape=(n,))
+
+    def add(self, ids, texts):
+        if not len(ids):
+            return
+        vectors = self.embedder.embed(texts).astype(np.float32, copy=False)
+        with self._locked():
+            # Vectors first: a crash between the two writes leaves unreferenced
+            # rows past the ids, which are dropped here before appending.
+            row_bytes = self.dim * 4
+            if os.path.exists(self.vectors_file) and os.path.getsize(self.vectors_file) != len(self) * row_bytes:
+                os.truncate(self.vectors_file, len(self) * row_bytes)
+            with open(self.vectors_file, 'ab') as f:
+                f.write(vectors.tobytes())
+            with open(self.ids_file, 'ab') as f:
+                f.write(np.asarray(ids, dtype=np.int64).tobytes())
+
+    def search(self, query, k=3):
+        """Returns [(id, cosine score)] of the k nearest memories, best first."""
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries, k=3):
+        """Batched top-k: one pass over the matrix for all queries."""
+        self._map()
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return [[] for _ in queries]
+        q = self.embedder.embed(queries).T  # (dim, m)
+        m = q.shape[1]
+        best_scores = np.full((0, m), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((0, m), dtype=np.int64)
+        for start in range(0, n, self.BLOCK_ROWS):
+            scores = np.asarray(self._matrix[start:start + self.BLOCK_ROWS] @ q)  # (block, m)
+            rows = np.arange(start, start + len(scores), dtype=np.int64)[:, None].repeat(m, axis=1)
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, rows])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, -k, axis=0)[-k:]
+                best_scores = np.take_along_axis(best_scores, keep, axis=0)
+                best_rows = np.take_along_axis(best_rows, keep, axis=0)
+
+        results = []
+        for col in range(m):
+            order = np.argsort(-best_scores[:, col])
+            results.append([(int(self._ids[best_rows[i, col]]), float(best_scores[i, col])) for i in order])
+        return results
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from ..memory.tokenize import tokenize
+
+try:
+    from ..memory.vector_store import HashingEmbedder
+except ImportError:  # NumPy not installed: exact lookups only
+    HashingEmbedder = None
+
+CACHE_FILE = "qwen/data/cache/plans.json"
+
+# Parameters are the parts of a goal a reused plan must not hard-code:
+# quoted strings, absolute or ./~ paths, relative paths ending in a file
+# name or a slash, and file names ("notes.txt"). Bare slashes ("and/or") and
+# dotted words whose "extension" starts with a digit ("qwen2.5") are not.
+PARAM_RE = re.compile(
+    r"(?<!\w)\"([^\"\n]+)\"(?!\w)"
+    r"|(?<!\w)'([^'\n]+)'(?!\w)"
+    r"|`([^`\n]+)`"
+    r"|((?<![\w./~-])(?:~|\.{1,2})?/[\w.-]+(?:/[\w.-]+)*/?"
+    r"|(?<![\w./~-])[\w.-]+(?:/[\w.-]+)*(?:/[\w-]*\.[A-Za-z][A-Za-z0-9]{0,7}|/)(?![\w/])"
+    r"|(?<![\w./~-])[A-Za-z_][\w-]*\.[A-Za-z][A-Za-z0-9]{0,7}(?![\w/]|\.\w))"
+)
+
+# Dotted abbreviations the file name pattern would otherwise take.
+NOT_PARAMS = frozenset(["e.g", "i.e", "a.k.a", "vs", "etc"])
+
+PLACEHOLDER_RE = re.compile(r"<param(\d+)>")
+
+def template(goal):
+    """Returns (template, params): goal with each parameter replaced by <paramN>, normalised."""
+    params = []
+
+    def placeholder(match):
+        value = next(group for group in match.groups() if group is not None)
+        if value.lower() in NOT_PARAMS:
+            return match.group(0)
+        if value not in params:
+            params.append(value)
+        return f"<param{params.index(value)}>"
+
+    text = PARAM_RE.sub(placeholder, goal)
+    return " ".join(text.lower().split()), params
+
+# Words that do not change what a goal asks for.
+STOPWORDS = frozenset("a an the and then to it its of in on at for with into from by please this that is be".split())
+
+def content_words(text):
+    """The template's words minus stopwords and placeholders, for similarity."""
+    return " ".join(w for w in tokenize(text) if w not in STOPWORDS and not w.startswith("param"))
+
+def _fill(text, values):
+    # One pass, so a value that itself looks like a placeholder is left alone.
+    return PLACEHOLDER_RE.sub(lambda m: values[int(m.group(1))], text)
+
+def _ambiguous(params, plan):
+    """Why a plan cannot be templated reliably for these parameters, or None."""
+    for value in params:
+        if len(value) < 3:
+            return f"parameter {value!r} is too short to replace safely"
+        if any(value != other and value in other for other in params):
+            return f"parameter {value!r} is part of another parameter"
+    if any(PLACEHOLDER_RE.search(node["task"]) for node in plan):
+        return "plan already contains a placeholder"
+    return None
+
+def _unfill(text, params):
+    """Replaces whole-token occurrences of each parameter with its placeholder, in one pass."""
+    if not params:
+        return text
+    index = {value: i for i, value in enumerate(params)}
+    alternatives = "|".join(re.escape(value) for value in sorted(params, key=len, reverse=True))
+    pattern = re.compile(rf"(?<![\w.-])(?:{alternatives})(?![\w-]|\.\w)")
+    return pattern.sub(lambda m: f"<param{index[m.group(0)]}>", text)
+
+class PlanCache:
+    """Plans of past goals, reused when a goal comes back.
+
+    Goals are keyed by a hash of their template (the goal with quoted strings
+    and file names replaced by placeholders), so "create file a.txt" and
+    "create file b.txt" share an entry and the stored plan is re-filled with
+    the new values. Without an exact match, the nearest stored template
+    (cosine over hashed content words) is used if it reaches threshold, takes
+    the same number of parameters and has the same set of content words, so
+    goals that differ only in word order or filler share a plan while
+    "...backed by SQLite" never runs the plan of "...backed by PostgreSQL".
+    Only plans whose every sub-task finished are stored, and an entry stops
+    being reused once it has failed as often as it has succeeded.
+    """
+
+    MAX_ENTRIES = 500
+
+    def __init__(self, path=CACHE_FILE, threshold=0.85, embedder=None):
+        self.path = path
+        self.threshold = threshold
+        self.embedder = embedder or (HashingEmbedder() if HashingEmbedder else None)
+        self.entries = None
+        self._vectors = None  # (keys, matrix) over usable entries, rebuilt after changes
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def _save(self):
+        if len(self.entries) > self.MAX_ENTRIES:
+            oldest = sorted(self.entries, key=lambda k: self.entries[k]["last_used"])
+            for key in oldest[:len(self.entries) - self.MAX_ENTRIES]:
+                del self.entries[key]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.path)
+        self._vectors = None
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _usable(entry):
+        return entry["successes"] > entry["failures"]
+
+    def _nearest(self, text, n_params):
+        if self.embedder is None:
+            return None, 0.0
+        if self._vectors is None:
+            keys = [k for k, e in self.entries.items() if self._usable(e)]
+            words = [content_words(self.entries[k]["template"]) for k in keys]
+            matrix = self.embedder.embed(words) if keys else None
+            self._vectors = (keys, matrix, [frozenset(w.split()) for w in words])
+        keys, matrix, word_sets = self._vectors
+        if not keys:
+            return None, 0.0
+        words = content_words(text)
+        scores = matrix @ self.embedder.embed([words])[0]
+        # Every content word must agree; similarity alone lets one changed noun through.
+        wanted = frozenset(words.split())
+        best, best_score = None, 0.0
+        for key, score, word_set in zip(keys, scores, word_sets):
+            if len(self.entries[key]["params"]) == n_params and word_set == wanted and score > best_score:
+                best, best_score = key, float(score)
+        return best, best_score
+
+    def lookup(self, goal):
+        """Returns (key, plan nodes, how it matched) for a reusable plan, or None."""
+        text, params = template(goal)
+        with self._lock:
+            entries = self._load()
+            key, how = self._key(text), "exact match"
+            if key not in entries or not self._usable(entries[key]):
+                key, score = self._nearest(text, len(params))
+                if key is None or score < self.threshold:
+                    return None
+                how = f"similarity {score:.2f}"
+            entry = entries[key]
+            entry["last_used"] = time.time()
+        plan = [dict(node, task=_fill(node["task"], params)) for node in entry["plan"]]
+        return key, plan, how
+
+    def record(self, goal, plan, success, source=None):
+        """Records how a plan for goal ended; source is the key of the entry it was reused from.
+
+        Returns False if a successful plan was not stored because its
+        parameters could not be templated unambiguously.
+        """
+        text, params = template(goal)
+        key = self._key(text)
+        with self._lock:
+            entries = self._load()
+            if not success:
+                # A fresh plan that failed is simply not stored.
+                if source in entries:
+                    entries[source]["failures"] += 1
+            else:
+                reason = _ambiguous(params, plan)
+                if reason:
+                    print(f"[Planner] Not caching plan: {reason}.")
+                    return False
+                # Store the plan with this goal's values turned back into placeholders.
+                nodes = [{"id": node["id"], "task": _unfill(node["task"], params), "depends_on": list(node["depends_on"])}
+                         for node in plan]
+                entry = entries.setdefault(key, {"template": text, "params": params, "successes": 0, "failures": 0})
+                entry.update(plan=nodes, params=params, goal=goal, last_used=time.time())
+                entry["successes"] += 1
+                if source in entries and source != key:
+                    entries[source]["successes"] += 1
+            self._save()
+        return True
@@ -1,24 +1,139 @@
-import ollama
 import json
+from ..llm.router import ModelRouter
+
+class PlanBuilder:
+    """Turns planner output into DAG nodes numbered 1..n, one item at a time.
+
+    Strings become a chain (each step depends on the one before). Objects keep
+    their dependencies, remapped to the new ids; a dependency on anything that
+    is not an earlier node is dropped, which also rules out cycles.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.id_map = {}
+
+    def add(self, item):
+        node_id = len(self.nodes) + 1
+        if isinstance(item, dict):
+            task = str(item.get('task') or item.get('description') or '')
+            raw_deps = item.get('depends_on') or []
+            if not isinstance(raw_deps, list): raw_deps = [raw_deps]
+            deps = sorted({self.id_map[str(d)] for d in raw_deps if str(d) in self.id_map})
+            self.id_map[str(item.get('id', node_id))] = node_id
+        else:
+            task = str(item)
+            deps = [node_id - 1] if node_id > 1 else []
+        node = {"id": node_id, "task": task, "depends_on": deps}
+        self.nodes.append(node)
+        return node
+
+def normalize_plan(items):
+    builder = PlanBuilder()
+    for item in items:
+        builder.add(item)
+    return builder.nodes
+
+class ArrayStreamParser:
+    """Yields the elements of the first top-level JSON array in streamed text as each one closes."""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.element = []
+        self.done = False
+
+    def feed(self, chunk):
+        items = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self.depth == 0:
+                if ch == '[':
+                    self.depth = 1
+                continue
+            if self.depth >= 2 or self.in_string or ch not in ' \t\r\n,':
+                self.element.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        items.extend(self._flush())
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in '[{':
+                self.depth += 1
+            elif ch in ']}':
+                self.depth -= 1
+                if self.depth == 1:
+                    items.extend(self._flush())
+                elif self.depth == 0:
+                    self.element = []
+                    self.done = True
+        return items
+
+    def _flush(self):
+        text, self.element = ''.join(self.element), []
+        try:
+            return [json.loads(text, strict=False)]
+        except ValueError:
+            return []
 
 class Planner:
-    def __init__(self, model_name="qwen2.5-coder:7b"):
+    def __init__(self, model_name="qwen2.5-coder:7b", keep_alive=None, router=None, cache=None):
         self.model = model_name
+        self.keep_alive = keep_alive
+        # Without a shared router every request goes to model_name.
+        self.router = router or ModelRouter(default_model=model_name, path=None)
+        self.cache = cache
+        self._reused = {}  # goal -> cache key of the plan handed out for it
 
-    def decompose(self, goal):
-        prompt = f"""Break down the following complex AI engineering goal into a sequence of small, verifiable sub-tasks. 
+    def _cached(self, goal):
+        hit = self.cache.lookup(goal) if self.cache else None
+        if hit is None:
+            return None
+        key, plan, how = hit
+        self._reused[goal] = key
+        print(f"[Planner] Reusing a cached plan ({how}): {len(plan)} sub-tasks.")
+        return plan
+
+    def record_outcome(self, goal, plan, success):
+        """Tells the plan cache whether every sub-task of goal's plan finished."""
+        source = self._reused.pop(goal, None)
+        if self.cache:
+            self.cache.record(goal, plan, success, source)
+
+    def _prompt(self, goal):
+        return f"""Break down the following complex AI engineering goal into small, verifiable sub-tasks. 
         Each sub-task must be independent enough to be solved in a few tool calls.
+        Sub-tasks that do not need each other's results should not depend on each other, so they can run in parallel.
         
         GOAL: {goal}
         
-        Output your response strictly as a JSON list of strings.
-        Example: ["Create directory X", "Write script Y", "Run and verify Z"]
+        Output your response strictly as a JSON list of objects with "id", "task" and "depends_on" (ids of earlier sub-tasks).
+        Example: [{{"id": 1, "task": "Create directory X", "depends_on": []}},
+                  {{"id": 2, "task": "Write script Y in X", "depends_on": [1]}},
+                  {{"id": 3, "task": "Write README in X", "depends_on": [1]}},
+                  {{"id": 4, "task": "Run and verify Y", "depends_on": [2]}}]
+        A plain JSON list of strings is also accepted and runs strictly in sequence.
         """
-        
+
+    def decompose(self, goal):
+        """Returns the plan as DAG nodes: [{"id": int, "task": str, "depends_on": [ids]}]."""
+        cached = self._cached(goal)
+        if cached is not None:
+            return cached
         print("[Planner] Decomposing goal into sub-tasks...")
-        response = ollama.chat(
-            model=self.model,
-            messages=[{'role': 'user', 'content': prompt}]
+        response = self.router.chat(
+            "plan",
+            messages=[{'role': 'user', 'content': self._prompt(goal)}],
+            keep_alive=self.keep_alive
         )
         
         content = response['message']['content']
@@ -26,9 +141,43 @@ class Planner:
             # Try to extract JSON list
             if "[" in content and "]" in content:
                 json_str = content[content.find("["):content.rfind("]")+1]
-                return json.loads(json_str)
+                return normalize_plan(json.loads(json_str))
         except:
             pass
             
+        return normalize_plan(self._fallback_lines(content))
+
+    def decompose_stream(self, goal):
+        """Yields plan nodes as soon as each element of the streamed JSON list is complete.
+
+        Falls back to the line-based split once the response is finished if it
+        held no usable JSON list.
+        """
+        cached = self._cached(goal)
+        if cached is not None:
+            yield from cached
+            return
+        print("[Planner] Streaming sub-tasks...")
+        stream = self.router.chat(
+            "plan",
+            messages=[{'role': 'user', 'content': self._prompt(goal)}],
+            stream=True,
+            keep_alive=self.keep_alive
+        )
+        parser = ArrayStreamParser()
+        builder = PlanBuilder()
+        content = ""
+        for chunk in stream:
+            token = chunk['message'].get('content') or ''
+            content += token
+            for item in parser.feed(token):
+                if isinstance(item, (dict, str)):
+                    yield builder.add(item)
+        if not builder.nodes:
+            for item in self._fallback_lines(content):
+                yield builder.add(item)
+
+    @staticmethod
+    def _fallback_lines(content):
         # Fallback: simple line-based split if JSON fails
         return [line.strip() for line in content.split('\n') if line.strip() and (line[0].isdigit() or line.startswith('-'))]
@@ -1,9 +1,13 @@
 import subprocess
 import os
 
+from ..memory.recall import default_service
+
 class ToolRegistry:
-    def __init__(self, memory_manager=None):
+    def __init__(self, memory_manager=None, output_store=None):
         self.memory = memory_manager
+        self.outputs = output_store
+        self.recall = default_service(memory_manager) if memory_manager else None
         self.registry = {
             'run_shell_command': self.run_shell_command,
             'read_file': self.read_file,
@@ -12,7 +16,8 @@ class ToolRegistry:
             'save_memory': self.save_memory,
             'recall_memory': self.recall_memory,
             'web_search': self.web_search,
-            'python_linter': self.python_linter
+            'python_linter': self.python_linter,
+            'read_tool_output': self.read_tool_output
         }
 
     def get_definitions(self):
@@ -76,7 +81,10 @@ class ToolRegistry:
                     'description': 'Save a fact to long-term memory',
                     'parameters': {
                         'type': 'object',
-                        'properties': {'content': {'type': 'string'}},
+                        'properties': {
+                            'content': {'type': 'string'},
+                            'tags': {'type': 'array', 'items': {'type': 'string'}}
+                        },
                         'required': ['content']
                     }
                 }
@@ -85,10 +93,14 @@ class ToolRegistry:
                 'type': 'function',
                 'function': {
                     'name': 'recall_memory',
-                    'description': 'Search long-term memory',
+                    'description': 'Search long-term memory (most relevant first)',
                     'parameters': {
                         'type': 'object',
-                        'properties': {'query': {'type': 'string'}},
+                        'properties': {
+                            'query': {'type': 'string'},
+                            'k': {'type': 'integer', 'description': 'Number of memories to return (default 3)'},
+                            'tags': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Only memories with all of these tags'}
+                        },
                         'required': ['query']
                     }
                 }
@@ -116,6 +128,22 @@ class ToolRegistry:
                         'required': ['code']
                     }
                 }
+            },
+            {
+                'type': 'function',
+                'function': {
+                    'name': 'read_tool_output',
+                    'description': 'Read lines of a tool output that was truncated in the conversation',
+                    'parameters': {
+                        'type': 'object',
+                        'properties': {
+                            'handle': {'type': 'string'},
+                            'start_line': {'type': 'integer', 'description': 'First line, 1-based (default 1)'},
+                            'end_line': {'type': 'integer', 'description': 'Last line (default: as many as fit in one page; next_start_line continues)'}
+                        },
+                        'required': ['handle']
+                    }
+                }
             }
         ]
 
@@ -138,16 +166,22 @@ class ToolRegistry:
         except Exception as e:
             return {"error": str(e)}
 
-    def save_memory(self, content):
+    def save_memory(self, content, tags=None):
         if self.memory:
-            return self.memory.save(content)
+            return self.memory.save(content, tags)
         return {"error": "Memory manager not linked"}
 
-    def recall_memory(self, query):
-        if self.memory:
-            return self.memory.retrieve_relevant(query)
+    def recall_memory(self, query, k=3, tags=None):
+        if self.recall:
+            results = self.recall.search(query, int(k), tags)
+            return "\n".join(text for text, _, _ in results)
         return {"error": "Memory manager not linked"}
 
+    def read_tool_output(self, handle, start_line=1, end_line=None):
+        if self.outputs:
+            return self.outputs.get(handle, start_line, end_line)
+        return {"error": "Output store not linked"}
+
     def execute(self, name, args):
         if name in self.registry:
             try:
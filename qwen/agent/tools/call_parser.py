@@ -0,0 +1,247 @@
+import json
+import re
+
+# Next character that matters outside a candidate, inside one and inside a
+# JSON string; the newline variants are used where code fences are tracked.
+OUTSIDE_RE = re.compile(r'[{\n]')
+OBJECT_RE = re.compile(r'[{}"]')
+FENCED_OBJECT_RE = re.compile(r'[{}"\n]')
+STRING_RE = re.compile(r'["\\]')
+FENCED_STRING_RE = re.compile(r'["\\\n]')
+SPACE_RE = re.compile(r'\S')
+INDENT_RE = re.compile(r'[ \t]*')
+
+def as_tool_call(data):
+    """Normalizes a parsed object to {'function': {'name', 'arguments'}}, or None if it is not a call."""
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get('function'), dict):
+        data = data['function']
+    name = data.get('name')
+    args = data.get('arguments', data.get('parameters'))
+    if not isinstance(name, str) or args is None:
+        return None
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            return None
+    if not isinstance(args, dict):
+        return None
+    return {'function': {'name': name, 'arguments': args}}
+
+def _parse(text):
+    """Returns (whether text is JSON, the tool call it holds or None, where decoding failed or None)."""
+    try:
+        data = json.loads(text, strict=False)
+    except json.JSONDecodeError as e:
+        return False, None, e.pos
+    except (ValueError, RecursionError):  # deeply nested input can exhaust the decoder's stack
+        return False, None, None
+    return True, as_tool_call(data), None
+
+class ToolCallScanner:
+    """Finds JSON tool calls in model output, fed in arbitrary chunks.
+
+    Tracks brace depth and string state across chunks and keeps only the
+    object currently being read (or the current line, until it is known not
+    to be a ``` fence), jumping between significant characters with regexes.
+    A '{' only opens a candidate when its next non-space character is '"' or
+    '}', and a nested '{' only continues it after ':', '[' or ','. Raw
+    newlines inside strings are accepted, as models often emit them in file
+    contents.
+
+    A candidate that cannot be JSON is dropped and the text is rescanned
+    from the character after its '{': when it closes but does not parse,
+    when a nested '{' is out of place (e.g. an unclosed dict on one line and
+    a real call on the next), when it was opened inside a ``` block and
+    reaches the closing fence (e.g. print("{") in fenced code), or when the
+    output ends with it still open (see finish()). A dropped candidate
+    remembers its nested objects, so the rescan does not read them again: one
+    still open when it was dropped would end the same way and is skipped, as
+    is one that contains the point where the candidate failed to decode, and
+    any other closed one is parsed from its known extent. A long run of
+    nested objects therefore costs linear time, not one pass per level.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.offset = 0  # characters trimmed off the front of buf so far
+        self.pos = 0
+        self.start = None  # index in buf of the open candidate's '{'
+        self.opening = False  # waiting for the first non-space after start
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.fence = False  # inside a ``` block (tracked outside candidates)
+        self.fenced = False  # the open candidate started inside one
+        self.line_start = 0
+        self.line_checked = False
+        self.nested = []  # offset positions of the open candidate's unclosed nested '{'
+        self.closed = []  # (start, end) offset positions of its closed nested objects
+        self.known = {}  # start -> (end or None if it never closes, fenced), from dropped candidates
+
+    def feed(self, chunk):
+        """Returns the tool calls completed by this chunk, in order."""
+        self._trim()
+        self.buf += chunk
+        return self._scan(final=False)
+
+    def finish(self):
+        """Call once the output is complete: returns calls found by rescanning an unclosed candidate."""
+        calls = self._scan(final=True)
+        self.__init__()
+        return calls
+
+    def _trim(self):
+        if self.start is not None:
+            keep = self.start
+        elif not self.line_checked:
+            keep = min(self.pos, self.line_start)
+        else:
+            keep = self.pos
+        if keep:
+            self.buf = self.buf[keep:]
+            self.offset += keep
+            self.pos -= keep
+            self.line_start -= keep
+            if self.start is not None:
+                self.start -= keep
+
+    def _line_is_fence(self, final):
+        """Whether the line at line_start opens or closes a ``` block; None until that is known."""
+        buf = self.buf
+        i = INDENT_RE.match(buf, self.line_start).end()
+        if buf.startswith('```', i):
+            return True
+        if len(buf) - i >= 3 or '\n' in buf[i:i + 3] or final:
+            return False
+        return None
+
+    def _abort(self, error=None):
+        """Drops the open candidate and rescans from just after its '{'.
+
+        error is where the candidate's JSON failed to decode, if it closed.
+        """
+        for start in self.nested:
+            self.known[start] = (None, self.fenced)
+        if error is not None:
+            error += self.offset + self.start
+        for start, end in self.closed:
+            if error is not None and start < error < end:
+                end = None  # the decoder failed inside it, so it fails on its own too
+            self.known[start] = (end, self.fenced)
+        self.nested, self.closed = [], []
+        self.pos = self.start + 1
+        self.start = None
+        self.opening = self.in_string = self.escape = False
+        self.depth = 0
+        self.line_checked = True  # the '{' line was checked before the candidate opened
+
+    def _scan(self, final):
+        calls = []
+        buf, n = self.buf, len(self.buf)
+        while True:
+            if not self.line_checked and (self.start is None or self.fenced):
+                fence = self._line_is_fence(final)
+                if fence is None:
+                    break
+                self.line_checked = True
+                if fence:
+                    if self.start is not None:
+                        self._abort()  # a fenced candidate never spans the closing fence
+                        continue
+                    self.fence = not self.fence
+                    self.pos = INDENT_RE.match(buf, self.line_start).end() + 3
+                continue
+            if self.start is None:
+                m = OUTSIDE_RE.search(buf, self.pos)
+                if m is None:
+                    self.pos = n
+                    break
+                self.pos = m.end()
+                if m.group() == '\n':
+                    self.line_start, self.line_checked = self.pos, False
+                    continue
+                known = self.known.pop(self.offset + m.start(), None)
+                if known is not None and known[1] == self.fence:
+                    # Read before as part of a dropped candidate: no need to scan it again.
+                    end = known[0]
+                    if end is not None:
+                        parsed, call, _ = _parse(buf[m.start():end - self.offset])
+                        if call:
+                            calls.append(call)
+                        if parsed:
+                            self.pos = end - self.offset
+                    continue
+                self.start, self.opening, self.fenced = m.start(), True, self.fence
+                self.line_checked = True
+                continue
+            if self.opening:
+                m = SPACE_RE.search(buf, self.pos)
+                if m is None:
+                    if not final:
+                        break
+                    self._abort()
+                elif m.group() in '"}':
+                    self.opening, self.depth = False, 1
+                else:
+                    self._abort()  # not JSON
+                continue
+            if self.escape:
+                if self.pos >= n:
+                    if not final:
+                        break
+                    self._abort()
+                    continue
+                self.escape, self.pos = False, self.pos + 1
+                continue
+            if self.in_string:
+                m = (FENCED_STRING_RE if self.fenced else STRING_RE).search(buf, self.pos)
+            else:
+                m = (FENCED_OBJECT_RE if self.fenced else OBJECT_RE).search(buf, self.pos)
+            if m is None:
+                self.pos = n
+                if not final:
+                    break
+                self._abort()
+                continue
+            c, self.pos = m.group(), m.end()
+            if c == '\n':
+                self.line_start, self.line_checked = self.pos, False
+            elif self.in_string:
+                if c == '\\':
+                    self.escape = True
+                else:
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c == '{':
+                j = m.start() - 1
+                while buf[j] in ' \t\r\n':
+                    j -= 1
+                if buf[j] not in ':[,':
+                    self._abort()
+                    continue
+                self.depth += 1
+                self.nested.append(self.offset + m.start())
+            else:
+                self.depth -= 1
+                if self.depth:
+                    self.closed.append((self.nested.pop(), self.offset + self.pos))
+                else:
+                    parsed, call, error = _parse(buf[self.start:self.pos])
+                    if not parsed:
+                        self._abort(error)
+                        continue
+                    if call:
+                        calls.append(call)
+                    self.start = None
+                    self.nested, self.closed = [], []
+                    self.line_checked = True  # the rest of this line follows the object
+        return calls
+
+def parse_tool_calls(text):
+    """All tool calls in a complete text."""
+    scanner = ToolCallScanner()
+    return scanner.feed(text) + scanner.finish()
@@ -0,0 +1,70 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+READ_ONLY_TOOLS = {'read_file', 'list_directory', 'recall_memory', 'web_search', 'python_linter', 'read_tool_output'}
+
+# Tools whose effects cannot be narrowed to a path: they conflict with everything.
+BARRIER_TOOLS = {'run_shell_command'}
+
+MEMORY_RESOURCE = '<memory>'
+
+def resources(name, args):
+    """Paths (or pseudo-resources) a tool call touches; None means everything."""
+    if name in BARRIER_TOOLS:
+        return None
+    if name in ('save_memory', 'recall_memory'):
+        return {MEMORY_RESOURCE}
+    path = args.get('path') if isinstance(args, dict) else None
+    if path:
+        return {os.path.abspath(os.path.expanduser(path))}
+    return set()
+
+def _overlap(a, b):
+    for x in a:
+        for y in b:
+            if x == y or x.startswith(y.rstrip(os.sep) + os.sep) or y.startswith(x.rstrip(os.sep) + os.sep):
+                return True
+    return False
+
+class ToolScheduler:
+    """Runs tool calls on a bounded pool, in parallel where it is safe.
+
+    A call waits for every earlier in-flight call it conflicts with: reads
+    never conflict with reads, a write conflicts with any call touching an
+    overlapping path, and shell commands conflict with everything. Because
+    the pool is FIFO, a call's dependencies have always started before it.
+    """
+
+    def __init__(self, run, max_workers=4):
+        self.run = run
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.in_flight = []  # (future, read_only, resources)
+
+    def _conflicts(self, read_only, res, other_read_only, other_res):
+        if read_only and other_read_only:
+            return False
+        if res is None or other_res is None:
+            return True
+        return _overlap(res, other_res)
+
+    def submit(self, tool):
+        name = tool['function']['name']
+        args = tool['function']['arguments']
+        read_only = name in READ_ONLY_TOOLS
+        res = resources(name, args)
+        with self.lock:
+            self.in_flight = [entry for entry in self.in_flight if not entry[0].done()]
+            deps = [f for f, ro, r in self.in_flight if self._conflicts(read_only, res, ro, r)]
+            future = self.pool.submit(self._run_after, deps, tool)
+            self.in_flight.append((future, read_only, res))
+        return future
+
+    def _run_after(self, deps, tool):
+        for dep in deps:
+            try:
+                dep.result()
+            except Exception:
+                pass
+        return self.run(tool)
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+
+# Run from the repo root: the engine's data paths (qwen/data/...) are relative to it.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qwen.agent.core.engine import QwenEngine
+from qwen.agent.llm.client import MODES as LLM_CACHE_MODES
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Qwen Chained Architect")
+    parser.add_argument("goal", nargs="?", help="Overall goal (interactive prompt if omitted)")
+    parser.add_argument("--resume", action="store_true", help="Continue the plan in qwen/data/state/active_plan.json")
+    parser.add_argument("--model", default="qwen2.5-coder:7b")
+    parser.add_argument("--plan-workers", type=int, default=3, help="Sub-tasks run concurrently")
+    parser.add_argument("--tool-workers", type=int, default=4, help="Tool calls run concurrently")
+    parser.add_argument("--context-tokens", type=int, default=2048, help="Budget for previous results in each prompt")
+    parser.add_argument("--summary-model", help="Model for summarizing older results (default: extractive)")
+    parser.add_argument("--keep-alive", default="30m", help="How long Ollama keeps the model loaded between calls")
+    parser.add_argument("--legacy-layout", action="store_true", help="Rebuild the whole prompt per sub-task (no prefix reuse)")
+    parser.add_argument("--no-pipeline", action="store_true", help="Wait for the whole plan before running sub-tasks")
+    parser.add_argument("--models-config", default="qwen/data/models.json", help="Routes and model table for the router")
+    parser.add_argument("--no-plan-cache", action="store_true", help="Always ask the model for a new plan")
+    parser.add_argument("--llm-cache", choices=LLM_CACHE_MODES,
+                        help="Reuse identical model answers: on, replay (cache only) or off (default)")
+    parser.add_argument("--no-stream", action="store_true")
+    args = parser.parse_args(argv)
+    if args.llm_cache:
+        os.environ["QWEN_LLM_CACHE"] = args.llm_cache
+
+    engine = QwenEngine(model_name=args.model, stream=not args.no_stream,
+                        tool_workers=args.tool_workers, plan_workers=args.plan_workers,
+                        context_tokens=args.context_tokens, summary_model=args.summary_model,
+                        stable_prefix=not args.legacy_layout, keep_alive=args.keep_alive,
+                        pipeline=not args.no_pipeline, models_config=args.models_config,
+                        plan_cache=not args.no_plan_cache)
+    engine.run(args.goal, resume=args.resume)
+
+if __name__ == "__main__":
+    main()
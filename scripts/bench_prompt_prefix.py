@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Prefill cost per sub-task turn, legacy vs prefix-stable prompt layout.
+
+Runs a local stub of Ollama's /api/chat that models its prompt cache: the
+prompt is rendered to text, the part shared with the previous prompt is
+free, and every new token costs --prefill-us microseconds. A synthetic chain
+plan is then driven through ContextBuilder.messages() in both layouts.
+
+    python3 scripts/bench_prompt_prefix.py --subtasks 12 --result-tokens 300
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qwen.agent.core.context import ContextBuilder, OutputStore, count_tokens
+
+SYSTEM_PROMPT = "You are Qwen, an Autonomous Architect. Focus ONLY on the current SUB-TASK provided. " * 4
+TOOLS = [{"type": "function", "function": {"name": f"tool_{i}", "description": "stub tool " * 20,
+                                          "parameters": {"type": "object", "properties": {}}}} for i in range(8)]
+
+def render(messages, tools):
+    """Rough chat template: tools first (as Qwen's template does), then each turn."""
+    parts = [json.dumps(tools)]
+    for msg in messages:
+        parts.append(f"<|im_start|>{msg['role']}\n{msg['content']}<|im_end|>\n")
+    return "".join(parts)
+
+class StubOllama(BaseHTTPRequestHandler):
+    prefill_us = 200
+    last_prompt = ""
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = render(body['messages'], body.get('tools') or [])
+        with self.lock:  # one slot, like a single loaded model
+            previous, StubOllama.last_prompt = StubOllama.last_prompt, prompt
+            shared = os.path.commonprefix([previous, prompt])
+            new_tokens = count_tokens(prompt) - count_tokens(shared)
+            duration = new_tokens * self.prefill_us / 1e6
+            time.sleep(duration)
+        reply = {"model": body['model'], "message": {"role": "assistant", "content": "done"}, "done": True,
+                 "prompt_eval_count": new_tokens, "prompt_eval_duration": int(duration * 1e9)}
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def chat(host, messages):
+    body = json.dumps({"model": "stub", "messages": messages, "tools": TOOLS, "stream": False}).encode()
+    req = urllib.request.Request(f"{host}/api/chat", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())
+
+def run_layout(host, builder, stable, subtasks, result_tokens):
+    goal = "Build a small CLI tool with tests and documentation"
+    results = []
+    turns = []
+    StubOllama.last_prompt = ""
+    for i in range(subtasks):
+        task = f"Sub-task {i + 1}: implement step {i + 1} of the tool"
+        messages = builder.messages(SYSTEM_PROMPT, goal, task, results, stable=stable)
+        started = time.perf_counter()
+        reply = chat(host, messages)
+        turns.append((reply["prompt_eval_count"], reply["prompt_eval_duration"] / 1e6, (time.perf_counter() - started) * 1000))
+        results.append({"task": task, "result": " ".join(f"line{i}_{j}" for j in range(result_tokens))})
+    return turns
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subtasks", type=int, default=12)
+    parser.add_argument("--result-tokens", type=int, default=300)
+    parser.add_argument("--context-tokens", type=int, default=2048)
+    parser.add_argument("--prefill-us", type=int, default=200, help="Stub prefill cost per new prompt token")
+    args = parser.parse_args()
+
+    StubOllama.prefill_us = args.prefill_us
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    store = OutputStore(os.path.join("qwen", "data", "cache", "bench_outputs"))
+
+    runs = {}
+    for name, stable in (("legacy", False), ("stable", True)):
+        runs[name] = run_layout(host, ContextBuilder(args.context_tokens, store=store), stable,
+                                args.subtasks, args.result_tokens)
+    server.shutdown()
+
+    print(f"{'turn':>4} | {'legacy tokens':>13} {'prefill ms':>10} | {'stable tokens':>13} {'prefill ms':>10}")
+    for i, (old, new) in enumerate(zip(runs["legacy"], runs["stable"])):
+        print(f"{i + 1:>4} | {old[0]:>13} {old[1]:>10.1f} | {new[0]:>13} {new[1]:>10.1f}")
+    totals = {name: sum(t[1] for t in turns) for name, turns in runs.items()}
+    speedup = totals["legacy"] / totals["stable"] if totals["stable"] else float("inf")
+    print(f"total prefill: legacy {totals['legacy']:.0f}ms, stable {totals['stable']:.0f}ms ({speedup:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Fuzz and benchmark the streaming tool-call scanner.
+
+Generates large, noisy model outputs (prose, ``` fences, Python code with
+braces, unclosed dicts and strings, nested and escaped JSON arguments, raw
+newlines in strings), checks that the scanner finds exactly the embedded
+calls whether fed whole or in random chunks, and compares throughput and
+recall with the old regex.
+
+    python3 scripts/bench_tool_call_parser.py --cases 300 --seed 1
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qwen.agent.tools.call_parser import ToolCallScanner, parse_tool_calls
+
+OLD_PATTERN = re.compile(r'\{"name":\s*"[^"]+",\s*"arguments":\s*\{.*?\}\}', re.DOTALL)
+
+def old_parse(content):
+    calls = []
+    for match in OLD_PATTERN.finditer(content):
+        try:
+            calls.append({'function': json.loads(match.group(0))})
+        except ValueError:
+            continue
+    return calls
+
+def random_text(rng, words):
+    alphabet = string.ascii_letters + "     .,:;!?'()[]-"
+    return "".join(rng.choice(alphabet) for _ in range(words * 6))
+
+NOISE = [
+    lambda rng: random_text(rng, rng.randint(5, 80)),
+    lambda rng: "```python\ndef f(x):\n    return {'a': x, 'b': {x}}\nprint(f\"{name} {{literal}}\")\n```\n",
+    lambda rng: "Here is the plan: { first, second } and a set {1, 2}.\n",
+    lambda rng: "```json\n[1, 2, {\"not\": \"a call\"}]\n```\n",
+    lambda rng: '{"name": "only a name"} {"arguments": {}} ',
+    lambda rng: "a stray quote \" and a } closing brace ",
+    # Candidates that never close: must not swallow the calls after them.
+    lambda rng: '```python\nprint("{")\n```\n',
+    lambda rng: 'x = {"a": 1\n',
+    # Long nested runs that never close or close invalid: must stay linear.
+    lambda rng: '{"a": ' * rng.randint(1, 300),
+    lambda rng: ('{"a": ' * rng.randint(1, 300)).rstrip() + '}' * 300,
+]
+
+def random_value(rng, depth=0):
+    kind = rng.randint(0, 5 if depth < 3 else 2)
+    if kind == 0:
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == 1:
+        return rng.choice([True, False, None, 1.5])
+    if kind == 2:
+        return "".join(rng.choice('ab{}[]"\\\n\t:,é ') for _ in range(rng.randint(0, 40)))
+    if kind == 3:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+def random_call(rng):
+    args = {f"arg{i}": random_value(rng) for i in range(rng.randint(1, 4))}
+    if rng.random() < 0.3:
+        args["content"] = "line one\nline two {braces} \"quoted\"\n" * rng.randint(1, 50)
+    name = rng.choice(["write_file", "read_file", "run_shell_command", "save_memory"])
+    text = json.dumps({"name": name, "arguments": args}, indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5)
+    if "content" in args and rng.random() < 0.5:
+        # Models often put literal newlines in string values.
+        text = text.replace("\\n", "\n")
+    if rng.random() < 0.3:
+        text = f"```json\n{text}\n```"
+    return {'function': {'name': name, 'arguments': args}}, text
+
+def make_case(rng, calls):
+    expected, parts = [], []
+    for _ in range(calls):
+        for _ in range(rng.randint(0, 3)):
+            parts.append(rng.choice(NOISE)(rng))
+        call, text = random_call(rng)
+        expected.append(call)
+        parts.append(text)
+    parts.append(rng.choice(NOISE)(rng))
+    return expected, "\n".join(parts)
+
+def chunked(rng, text):
+    i = 0
+    while i < len(text):
+        size = rng.choice([1, 2, 3, 7, 16, 64, 512])
+        yield text[i:i + size]
+        i += size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=300)
+    parser.add_argument("--calls", type=int, default=20, help="Tool calls per case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    cases = [make_case(rng, rng.randint(0, args.calls)) for _ in range(args.cases)]
+    total_bytes = sum(len(text) for _, text in cases)
+    failures = 0
+    for n, (expected, text) in enumerate(cases):
+        whole = parse_tool_calls(text)
+        scanner = ToolCallScanner()
+        streamed = [call for chunk in chunked(rng, text) for call in scanner.feed(chunk)] + scanner.finish()
+        if whole != expected or streamed != expected:
+            failures += 1
+            if failures <= 3:
+                print(f"case {n}: expected {len(expected)} calls, whole {len(whole)}, streamed {len(streamed)}")
+
+    timings = {}
+    for name, parse in (("scanner", parse_tool_calls), ("old regex", old_parse)):
+        started = time.perf_counter()
+        found = sum(len(parse(text)) for _, text in cases)
+        timings[name] = (time.perf_counter() - started, found)
+    expected_calls = sum(len(expected) for expected, _ in cases)
+
+    print(f"{args.cases} cases, {total_bytes / 1e6:.1f} MB, {expected_calls} embedded calls")
+    for name, (seconds, found) in timings.items():
+        print(f"{name:>10}: {total_bytes / 1e6 / seconds:7.1f} MB/s, {found} calls found")
+    print("fuzz: OK" if not failures else f"fuzz: {failures} mismatching cases")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
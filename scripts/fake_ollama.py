@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Fake Ollama server for exercising the agent without a model.
+
+Answers /api/chat (blocking or streamed as chunked NDJSON) over keep-alive
+HTTP/1.1, echoing the last user message back word by word. It can inject
+latency and transient 503s to exercise the client's timeouts and retries.
+
+    python3 scripts/fake_ollama.py --port 11435 --latency 0.2 --fail-rate 0.1 &
+    OLLAMA_HOST=http://127.0.0.1:11435 python3 -m qwen.main "Create hello.txt"
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+    fail_rate = 0.0
+    reply = None
+    stats = {"requests": 0, "failures": 0, "cancelled": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b"{}")
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            self._answer(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away mid-answer (cancelled or timed out).
+            with self.lock:
+                self.stats["cancelled"] += 1
+            self.close_connection = True
+        finally:
+            with self.lock:
+                self.stats["in_flight"] -= 1
+
+    def _answer(self, body):
+        if self.path != "/api/chat":
+            return self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+        if random.random() < self.fail_rate:
+            with self.lock:
+                self.stats["failures"] += 1
+            return self._send_json(503, {"error": "server busy"})
+        time.sleep(self.latency)
+        messages = body.get("messages") or []
+        users = [m.get("content", "") for m in messages if m.get("role") == "user"]
+        text = self.reply if self.reply is not None else (f"done: {users[-1]}" if users else "")
+        model = body.get("model", "fake")
+        if not body.get("stream", True):
+            time.sleep(self.token_delay * len(text.split(" ")))  # same generation time, just not streamed
+            return self._send_json(200, {"model": model, "message": {"role": "assistant", "content": text}, "done": True})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in text.split(" "):
+            time.sleep(self.token_delay)
+            self._chunk({"model": model, "message": {"role": "assistant", "content": word + " "}, "done": False})
+        self._chunk({"model": model, "message": {"role": "assistant", "content": ""}, "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+def serve(port=0, latency=0.0, token_delay=0.0, fail_rate=0.0, reply=None):
+    """Starts the server on a daemon thread; returns (server, base URL)."""
+    FakeOllama.latency, FakeOllama.token_delay = latency, token_delay
+    FakeOllama.fail_rate, FakeOllama.reply = fail_rate, reply
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each answer")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed words")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--reply", help="Fixed reply instead of echoing the user")
+    args = parser.parse_args()
+    server, url = serve(args.port, args.latency, args.token_delay, args.fail_rate, args.reply)
+    print(f"Fake Ollama listening on {url}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(FakeOllama.stats))
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
-import ollama
 import subprocess
 import os
 import sys
 import json
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from qwen.agent.llm import client as llm
+from qwen.agent.tools.call_parser import parse_tool_calls
+
 # Define the tools
 def run_shell_command(command):
     print(f"[*] Executing Terminal: {command}")
@@ -98,7 +101,7 @@ def agent_loop(model_name, initial_prompt=None):
         turn_count = 0
         
         while turn_count < max_tool_turns:
-            response = ollama.chat(
+            response = llm.chat(
                 model=model_name,
                 messages=messages,
                 tools=tools,
@@ -109,12 +112,8 @@ def agent_loop(model_name, initial_prompt=None):
             
             # Fallback: Parse JSON from content if model didn't use structured tool calls
             content = response['message'].get('content', '')
-            if not tool_calls and content.strip().startswith('{'):
-                try:
-                    potential_call = json.loads(content)
-                    if 'name' in potential_call and 'arguments' in potential_call:
-                        tool_calls = [{'function': potential_call}]
-                except: pass
+            if not tool_calls:
+                tool_calls = parse_tool_calls(content)
 
             if not tool_calls:
                 print(f"Agent: {content}")
@@ -155,4 +154,7 @@ if __name__ == "__main__":
     model = "qwen2.5-coder:7b"
     prompt = sys.argv[1] if len(sys.argv) > 1 else None
     print(f"--- Starting Agent with {model} ---")
-    agent_loop(model, prompt)
+    try:
+        agent_loop(model, prompt)
+    finally:
+        llm.default_client().report()
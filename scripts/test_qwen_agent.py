@@ -1,15 +1,21 @@
-import ollama
 import json
 import sys
 import os
+import tempfile
 
 # Add current folder to path so we can import from qwen
 sys.path.append(os.getcwd())
 from qwen.agent.core.engine import QwenEngine
+from qwen.agent.llm import client as llm
+from qwen.agent.memory.manager import MemoryManager
+from qwen.agent.tools.base import ToolRegistry
 
-def autonomous_test():
+def autonomous_test(memory_dir):
     print("--- Starting Autonomous Validation of Qwen Agent ---")
     agent = QwenEngine()
+    # A fresh memory store each run, so tool results ("Memory saved with ID 1")
+    # and with them every later request repeat exactly; --replay relies on it.
+    agent.tools = ToolRegistry(memory_manager=MemoryManager(memory_dir), output_store=agent.outputs)
     
     # Task: "Create a file named 'hello.txt' with content 'world', then save this action to your memory."
     user_input = "Create a file named 'hello.txt' with content 'world', then save this action to your memory."
@@ -27,7 +33,7 @@ def autonomous_test():
     
     for i in range(max_turns):
         print(f"\n[Turn {i+1}] Thinking...")
-        response = ollama.chat(
+        response = llm.chat(
             model=agent.model,
             messages=history,
             tools=agent.tools.get_definitions()
@@ -66,6 +72,14 @@ def autonomous_test():
     print(f"File Created: {'PASS' if file_created else 'FAIL'}")
     print(f"Memory Updated: {'PASS' if memory_updated else 'FAIL'}")
     print(f"Thinking Loop: {'PASS' if (file_created and memory_updated) else 'FAIL'}")
+    llm.default_client().report()
 
 if __name__ == "__main__":
-    autonomous_test()
+    if "--replay" in sys.argv[1:]:
+        # Serve every model call from the response cache; fail on anything unrecorded.
+        os.environ["QWEN_LLM_CACHE"] = "replay"
+    else:
+        # Record this run's answers so a later --replay can serve them.
+        os.environ.setdefault("QWEN_LLM_CACHE", "on")
+    with tempfile.TemporaryDirectory() as memory_dir:
+        autonomous_test(memory_dir)
@@ -1,10 +1,8 @@
 #!/usr/bin/env python3
 import os
 import sys
-import json
 import subprocess
 import socket
-import glob
 
 # ANSI Colors
 RED = '\033[91m'
@@ -14,6 +12,8 @@ BLUE = '\033[94m'
 RESET = '\033[0m'
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'personality', 'scripts'))
+import state_store
 
 def print_header(title):
     print(f"\n{BLUE}=== {title} ==={RESET}")
@@ -34,13 +34,7 @@ def check_port(port):
         return s.connect_ex(('localhost', port)) == 0
 
 def read_json(path):
-    if os.path.exists(path):
-        try:
-            with open(path, 'r') as f:
-                return json.load(f)
-        except:
-            return None
-    return None
+    return state_store.load_json(path, default=None)
 
 def tail_file(path, lines=3):
     if os.path.exists(path):